@@ -0,0 +1,46 @@
+# Reads the sample invoices --repeat times with pd.read_excel and with
+# xlsxreader and reports files/s for both, after checking that both readers
+# give the same columns.
+#
+#   python bench_reader.py --repeat 50
+import argparse
+import glob
+import time
+
+import pandas as pd
+
+import main as invoices
+import xlsxreader
+
+
+def check(filepath):
+    read=xlsxreader.read(filepath)
+    frame=pd.read_excel(filepath)
+    if list(read)!=list(frame.columns):
+        raise SystemExit(f"{filepath}: columns differ")
+    for column in read:
+        if invoices.column_text(read,column)!=invoices.column_text(frame,column):
+            raise SystemExit(f"{filepath}: {column} differs")
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("pattern",nargs="?",default="*.xlsx")
+    parser.add_argument("--repeat",type=int,default=50)
+    args=parser.parse_args()
+    filepaths=sorted(glob.glob(args.pattern))
+    for filepath in filepaths:
+        check(filepath)
+    print(f"{'reader':>12} {'files':>8} {'time':>9} {'files/s':>10}")
+    for name,read in (("read_excel",pd.read_excel),("xlsxreader",xlsxreader.read)):
+        began=time.perf_counter()
+        for _ in range(args.repeat):
+            for filepath in filepaths:
+                read(filepath)
+        elapsed=time.perf_counter()-began
+        count=args.repeat*len(filepaths)
+        print(f"{name:>12} {count:>8} {elapsed:>8.2f}s {count/elapsed:>10.1f}")
+
+
+if __name__=="__main__":
+    main()
@@ -1,15 +1,215 @@
+import argparse
 import pandas as pd
 import glob
-from fpdf import FPDF
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-filepath=glob.glob("*.xlsx")
-for i in filepath:
-    print(i)
-    read=pd.read_excel(i)
-    pdf = FPDF(orientation='P', unit='mm', format='A4')
-    filename=Path(i).stem  
+import compression
+import manifest
+import reproducible
+import watch
+import xlsxreader
+from compression import CompressedFPDF
+from reproducible import ReproducibleFPDF
+
+
+# columns of the invoice table and how wide they are in mm
+COLUMNS=["product_id","product_name","amount_purchased","price_per_unit","total_price"]
+WIDTHS=[30,64,36,30,30]
+
+# seconds between progress lines of a batch
+PROGRESS_EVERY=2
+
+
+class InvoicePDF(ReproducibleFPDF,CompressedFPDF):
+    def table_rows(self,widths,rows,h):
+        # Same output as cell(w=width,h=h,txt=text,border=1) for every value
+        # and ln(h) after every row, but the parts of each cell that do not
+        # change from row to row are formatted once up front.
+        if self.color_flag or self.underline or self.unifontsubset:
+            for row in rows:
+                for text,width in zip(row,widths):
+                    self.cell(w=width,h=h,txt=text,border=1)
+                self.ln(h)
+            return
+        k=self.k
+        boxes=[]
+        texts=[]
+        x=self.l_margin
+        for width in widths:
+            boxes.append("%.2f %%.2f %.2f %.2f re S " % (x*k,width*k,-h*k))
+            texts.append("BT %.2f %%.2f Td (%%s) Tj ET" % ((x+self.c_margin)*k))
+            x+=width
+        cells=list(zip(boxes,texts))
+        for row in rows:
+            if self.y+h>self.page_break_trigger and self.accept_page_break():
+                self.add_page(self.cur_orientation)
+            top=(self.h-self.y)*k
+            baseline=(self.h-(self.y+.5*h+.3*self.font_size))*k
+            self._out("\n".join(box % top+(text % (baseline,self._escape(value)) if value!="" else "")
+                                 for (box,text),value in zip(cells,row)))
+            self.lasth=h
+            self.x=self.l_margin
+            self.y+=h
+
+
+def read_invoice(i):
+    # the invoice's columns, from the xlsx file directly when it is plain
+    # enough, with pandas otherwise
+    try:
+        return xlsxreader.read(i)
+    except xlsxreader.Unsupported:
+        return pd.read_excel(i)
+
+
+def column_text(read,column):
+    # a column as text, the way pandas prints its values
+    if isinstance(read,pd.DataFrame):
+        return read[column].astype(str).tolist()
+    return [str(value) for value in read[column]]
+
+
+def invoice_table(pdf,read):
+    pdf.set_font("Arial", size=10, style="B")
+    for column,width in zip(COLUMNS,WIDTHS):
+        pdf.cell(w=width,h=8,txt=column.replace("_"," ").title(),border=1)
+    pdf.ln(8)
+    pdf.set_font("Arial", size=10)
+    # one list of strings per column, converted in one go, then the rows
+    # are zipped out of them
+    columns=[column_text(read,column) for column in COLUMNS]
+    pdf.table_rows(WIDTHS,zip(*columns),8)
+    cell=pdf.cell
+    total=float(read["total_price"].sum() if isinstance(read,pd.DataFrame) else sum(read["total_price"]))
+    # cents, without trailing zeros: 32.5 and 1234567.89, not 1.23457e+06
+    total=f"{total:.2f}".rstrip("0").rstrip(".")
+    for width in WIDTHS[:-1]:
+        cell(w=width,h=8,txt="",border=1)
+    pdf.set_font("Arial", size=10, style="B")
+    cell(w=WIDTHS[-1],h=8,txt=total,border=1,ln=1)
+    pdf.ln(4)
+    pdf.cell(w=0,h=8,txt=f"The total price is {total}",ln=1)
+
+
+def render_invoice(i,reproducible_output=False,level=compression.LEVELS["default"]):
+    read=read_invoice(i)
+    pdf = InvoicePDF(orientation='P', unit='mm', format='A4')
+    pdf.reproducible=reproducible_output
+    pdf.set_compression_level(level)
+    filename=Path(i).stem
     invoice_nr=filename.split("-")[0]
     pdf.add_page()
     pdf.set_font("Arial", size=16,style="B")
-    pdf.cell(w=50,h=10,txt=f"invoice_nr.{invoice_nr}",ln=1) 
-    pdf.output(f"{filename}.pdf") 
\ No newline at end of file
+    pdf.cell(w=50,h=10,txt=f"invoice_nr.{invoice_nr}",ln=1)
+    invoice_table(pdf,read)
+    output=f"{filename}.pdf"
+    pdf.output(output)
+    if reproducible_output:
+        reproducible.write_digest(output)
+    return output
+
+
+def render_task(task):
+    # render_invoice for one file of a batch; an invoice that cannot be
+    # rendered is reported back instead of ending the batch
+    i,reproducible_output,level=task
+    try:
+        return i,render_invoice(i,reproducible_output,level),None
+    except Exception as error:
+        return i,None,f"{type(error).__name__}: {error}"
+
+
+def up_to_date(i):
+    # whether the invoice's PDF was written after the invoice last changed
+    try:
+        return os.path.getmtime(f"{Path(i).stem}.pdf")>=os.path.getmtime(i)
+    except OSError:
+        return False
+
+
+def render_batch(filepaths,workers=None,reproducible_output=False,level=compression.LEVELS["default"],
+                 progress=sys.stderr):
+    # Renders every invoice, in worker processes if workers is set. Returns
+    # (path, PDF) pairs of the ones that rendered and (path, error) pairs of
+    # the ones that failed.
+    tasks=[(i,reproducible_output,level) for i in filepaths]
+    done=[]
+    failed=[]
+    began=last=time.perf_counter()
+    if workers:
+        pool=ProcessPoolExecutor(workers)
+        results=pool.map(render_task,tasks,chunksize=max(1,min(64,len(tasks)//(workers*4))))
+    else:
+        pool=None
+        results=map(render_task,tasks)
+    try:
+        for count,(i,output,error) in enumerate(results,1):
+            if error:
+                failed.append((i,error))
+            else:
+                done.append((i,output))
+            now=time.perf_counter()
+            if progress and (now-last>=PROGRESS_EVERY or count==len(tasks)):
+                last=now
+                print(f"{count}/{len(tasks)} invoices, {count/(now-began):.1f}/s, {len(failed)} failed",file=progress)
+    finally:
+        if pool:
+            pool.shutdown()
+    return done,failed
+
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description="Write a PDF invoice for every xlsx file.")
+    parser.add_argument("pattern",nargs="?",default="*.xlsx")
+    parser.add_argument("-r","--reproducible",action="store_true",
+                        help="write the same bytes for the same invoice and a .sha256 file next to each PDF")
+    parser.add_argument("-c","--compression",choices=compression.LEVELS,default="default",
+                        help="how hard to compress page content: none, fast (zlib 1), default (6) or max (9)")
+    parser.add_argument("-w","--workers",type=int,default=None,
+                        help="render invoices in this many processes (0: one per core)")
+    parser.add_argument("-q","--quarantine",default="quarantine.txt",
+                        help="where to list the invoices that could not be rendered, with the reason")
+    parser.add_argument("-i","--incremental",action="store_true",
+                        help=f"only render invoices that changed since the last run and delete the PDFs of "
+                             f"invoices that are gone (manifest in {manifest.MANIFEST})")
+    parser.add_argument("--watch",default=None,metavar="DIR",
+                        help="keep running and render invoices as they are written to DIR (pattern is then "
+                             "matched against file names in DIR)")
+    parser.add_argument("--debounce",type=float,default=watch.DEBOUNCE,metavar="SECONDS",
+                        help="with --watch, how long a file must stay unchanged before it is rendered")
+    parser.add_argument("--metrics",default=None,metavar="FILE",
+                        help="with --watch, keep queue depth, latency and throughput in this JSON file")
+    args=parser.parse_args()
+    workers=args.workers or os.cpu_count() if args.workers is not None else None
+    level=compression.LEVELS[args.compression]
+    if args.watch:
+        watcher=watch.Watcher(args.watch,render_task,(args.reproducible,level),os.path.basename(args.pattern),
+                              workers or 1,debounce=args.debounce,current=up_to_date,
+                              quarantine=args.quarantine)
+        signal.signal(signal.SIGTERM,lambda *_: watcher.stop())
+        watcher.run(PROGRESS_EVERY,args.metrics)
+        sys.exit(1 if watcher.failed else 0)
+    filepath=sorted(glob.glob(args.pattern))
+    if args.incremental:
+        entries=manifest.load()
+        removed=manifest.collect(entries,filepath)
+        pending,fresh,touched=manifest.changed(filepath,entries,f"{level}:{args.reproducible}")
+        done,failed=render_batch(pending,workers,args.reproducible,level)
+        if removed or fresh or touched:
+            manifest.record(entries,fresh,done)
+            manifest.save(entries)
+        print(f"{len(done)} of {len(filepath)} invoices rendered, {len(removed)} PDFs removed",file=sys.stderr)
+    else:
+        done,failed=render_batch(filepath,workers,args.reproducible,level)
+    if failed:
+        with open(args.quarantine,"w") as file:
+            for i,error in failed:
+                file.write(f"{i}\t{error}\n")
+        print(f"{len(failed)} invoices could not be rendered, see {args.quarantine}",file=sys.stderr)
+        sys.exit(1)
+    if os.path.exists(args.quarantine):
+        # nothing failed this time, the list of an earlier run is stale
+        os.remove(args.quarantine)
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import tempfile
+
+# Incremental runs: the manifest remembers every invoice's size, mtime and
+# hash, the PDF written for it and that PDF's size and mtime. An invoice is
+# rendered again when its content, the render settings or its PDF changed;
+# invoices whose size and mtime did not change are not even read.
+
+MANIFEST=".invoices.json"
+
+
+def file_hash(filepath):
+    digest=hashlib.sha1()
+    with open(filepath,"rb") as file:
+        for block in iter(lambda: file.read(1<<20),b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stat(filepath):
+    try:
+        stat=os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size,stat.st_mtime_ns]
+
+
+def load(path=MANIFEST):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError,ValueError):
+        return {}
+
+
+def save(entries,path=MANIFEST):
+    handle,temporary=tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    with os.fdopen(handle,"w") as file:
+        # dumps is much faster than dump's streaming encoder
+        file.write(json.dumps(entries))
+    os.replace(temporary,path)
+
+
+def changed(filepaths,entries,mode):
+    # The invoices that need rendering, a fresh entry without the output
+    # for each of them, and whether entries of unchanged invoices got a new
+    # mtime because only that changed.
+    pending=[]
+    fresh={}
+    touched=False
+    for filepath in filepaths:
+        stat=_stat(filepath)
+        entry=entries.get(filepath)
+        if entry and entry["stat"]==stat:
+            content=entry["hash"]
+        else:
+            content=file_hash(filepath)
+        if (entry and entry["hash"]==content and entry["mode"]==mode
+                and _stat(entry["output"])==entry["pdf"]):
+            if entry["stat"]!=stat:
+                entry["stat"]=stat
+                touched=True
+            continue
+        pending.append(filepath)
+        fresh[filepath]={"stat":stat,"hash":content,"mode":mode}
+    return pending,fresh,touched
+
+
+def record(entries,fresh,done):
+    # adds the invoices that rendered, with their PDFs; the others are left
+    # out so the next run tries them again
+    for filepath in fresh:
+        entries.pop(filepath,None)
+    for filepath,output in done:
+        entry=fresh[filepath]
+        entry["output"]=output
+        entry["pdf"]=_stat(output)
+        entries[filepath]=entry
+
+
+def collect(entries,filepaths):
+    # Deletes the PDFs of invoices that are gone and forgets them. Returns
+    # the deleted PDFs. filepaths are invoices known to exist.
+    removed=[]
+    filepaths=set(filepaths)
+    for filepath in [filepath for filepath in entries
+                     if filepath not in filepaths and not os.path.exists(filepath)]:
+        entry=entries.pop(filepath)
+        # only if it is still the PDF this wrote
+        if _stat(entry["output"])==entry["pdf"]:
+            os.remove(entry["output"])
+            removed.append(entry["output"])
+            if os.path.exists(entry["output"]+".sha256"):
+                os.remove(entry["output"]+".sha256")
+    return removed
@@ -0,0 +1,237 @@
+import fnmatch
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer=None
+
+# Service mode: invoices are rendered as they land in a directory. Changes
+# come from watchdog (inotify on Linux) or, without it, from scanning the
+# directory. A file is only queued once its size and mtime have stayed the
+# same for the debounce time, so half-copied files are not picked up. The
+# queue is bounded: when the workers fall behind, files wait in the
+# debounce list instead of piling up in memory twice.
+
+# seconds a file must stay unchanged before it is rendered
+DEBOUNCE=0.5
+# seconds between directory scans without watchdog
+SCAN_EVERY=1.0
+# latencies kept for the percentiles
+WINDOW=10000
+# seconds of renders the throughput is measured over
+RATE_WINDOW=60
+
+
+def _stat(filepath):
+    try:
+        stat=os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return stat.st_size,stat.st_mtime_ns
+
+
+def percentile(values,fraction):
+    if not values:
+        return None
+    values=sorted(values)
+    return values[min(len(values)-1,int(fraction*len(values)))]
+
+
+class Watcher:
+    def __init__(self,directory,render,options=(),pattern="*.xlsx",workers=1,queue_size=None,
+                 debounce=DEBOUNCE,initializer=None,current=None,quarantine=None):
+        # render((path, *options)) runs in a worker process and returns
+        # (path, PDF, error) like main.render_task. Files current(path) says
+        # are up to date when the watch starts are left alone. Failures are
+        # added to the quarantine file as they happen.
+        self.directory=directory
+        self.render=render
+        self.options=options
+        self.current=current
+        self.quarantine=quarantine
+        self.pattern=pattern
+        self.debounce=debounce
+        self.workers=workers
+        self.queue=queue.Queue(queue_size or workers*4)
+        self.pool=ProcessPoolExecutor(workers,initializer=initializer)
+        self.lock=threading.Lock()
+        # path -> (stat, last change, first seen) of files settling down
+        self.pending={}
+        self.active=set()
+        # what each file looked like when it was queued last
+        self.queued={}
+        self.known={}
+        self.latencies=deque(maxlen=WINDOW)
+        self.finished=deque()
+        self.rendered=0
+        self.failed=[]
+        self.started=time.monotonic()
+        self.stopping=threading.Event()
+
+    def wanted(self,filepath):
+        name=os.path.basename(filepath)
+        # Excel lock files and hidden temporary copies
+        return fnmatch.fnmatch(name,self.pattern) and not name.startswith(("~$","."))
+
+    def touch(self,filepath,now=None):
+        # something happened to filepath; it is rendered once it settles
+        if not self.wanted(filepath):
+            return
+        now=now or time.monotonic()
+        with self.lock:
+            _,_,first=self.pending.get(filepath,(None,None,now))
+            self.pending[filepath]=(_stat(filepath),now,first)
+
+    def scan(self,first=False):
+        # Finds new and changed files by listing the directory; the only
+        # source of changes without watchdog, and the start-up pass with it.
+        seen={}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and self.wanted(entry.path):
+                    stat=entry.stat()
+                    seen[entry.path]=stat=(stat.st_size,stat.st_mtime_ns)
+                    if self.known.get(entry.path)==stat:
+                        continue
+                    if first and self.current and self.current(entry.path):
+                        self.queued[entry.path]=stat
+                    else:
+                        self.touch(entry.path)
+        self.known=seen
+
+    def settle(self):
+        # Moves files that stopped changing into the queue. Blocks while the
+        # queue is full.
+        now=time.monotonic()
+        ready=[]
+        with self.lock:
+            for filepath,(stat,changed,first) in list(self.pending.items()):
+                if filepath in self.active:
+                    continue
+                current=_stat(filepath)
+                if current is None:
+                    del self.pending[filepath]
+                elif current!=stat:
+                    self.pending[filepath]=(current,now,first)
+                elif now-changed>=self.debounce:
+                    del self.pending[filepath]
+                    # events that came in for a version already rendered
+                    if self.queued.get(filepath)==current:
+                        continue
+                    self.queued[filepath]=current
+                    self.active.add(filepath)
+                    ready.append((first,filepath))
+        for first,filepath in sorted(ready):
+            self.queue.put((filepath,first))
+
+    def work(self):
+        while True:
+            task=self.queue.get()
+            if task is None:
+                return
+            filepath,first=task
+            try:
+                _,output,error=self.pool.submit(self.render,(filepath,*self.options)).result()
+            except Exception as exception:
+                error=f"{type(exception).__name__}: {exception}"
+            now=time.monotonic()
+            with self.lock:
+                self.active.discard(filepath)
+                if error:
+                    self.failed.append((filepath,error))
+                    if self.quarantine:
+                        with open(self.quarantine,"a") as file:
+                            file.write(f"{filepath}\t{error}\n")
+                else:
+                    self.rendered+=1
+                    self.latencies.append(now-first)
+                    self.finished.append(now)
+
+    def metrics(self):
+        now=time.monotonic()
+        with self.lock:
+            while self.finished and now-self.finished[0]>RATE_WINDOW:
+                self.finished.popleft()
+            latencies=list(self.latencies)
+            return {"queue_depth":self.queue.qsize(),"settling":len(self.pending),"in_flight":len(self.active)-self.queue.qsize(),
+                    "rendered":self.rendered,"failed":len(self.failed),
+                    "p50_latency":percentile(latencies,.5),"p99_latency":percentile(latencies,.99),
+                    "throughput":len(self.finished)/min(RATE_WINDOW,max(now-self.started,1e-9))}
+
+    def run(self,report_every=2,metrics_file=None,report=sys.stderr):
+        # watches until interrupted or stop() is called
+        threads=[threading.Thread(target=self.work,daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        observer=None
+        if Observer is not None:
+            observer=Observer()
+            observer.schedule(_Handler(self),self.directory,recursive=False)
+            observer.start()
+        self.scan(first=True)
+        last_scan=last_report=time.monotonic()
+        try:
+            while not self.stopping.is_set():
+                self.settle()
+                now=time.monotonic()
+                if observer is None and now-last_scan>=SCAN_EVERY:
+                    self.scan()
+                    last_scan=now
+                if now-last_report>=report_every:
+                    last_report=now
+                    self.publish(report,metrics_file)
+                self.stopping.wait(min(self.debounce/4,.1))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            for _ in threads:
+                self.queue.put(None)
+            for thread in threads:
+                thread.join()
+            self.pool.shutdown()
+            self.publish(report,metrics_file)
+
+    def publish(self,report,metrics_file):
+        metrics=self.metrics()
+        if report:
+            latency=lambda value: "-" if value is None else f"{value*1000:.0f}ms"
+            print(f"queue {metrics['queue_depth']}, settling {metrics['settling']}, "
+                  f"rendering {metrics['in_flight']}, {metrics['rendered']} rendered, {metrics['failed']} failed, "
+                  f"p50 {latency(metrics['p50_latency'])}, p99 {latency(metrics['p99_latency'])}, "
+                  f"{metrics['throughput']:.1f}/s",file=report)
+        if metrics_file:
+            temporary=metrics_file+".part"
+            with open(temporary,"w") as file:
+                json.dump(metrics,file)
+            os.replace(temporary,metrics_file)
+
+    def stop(self):
+        self.stopping.set()
+
+
+if Observer is not None:
+    class _Handler(FileSystemEventHandler):
+        def __init__(self,watcher):
+            self.watcher=watcher
+
+        def on_created(self,event):
+            if not event.is_directory:
+                self.watcher.touch(event.src_path)
+
+        on_modified=on_created
+
+        def on_moved(self,event):
+            if not event.is_directory:
+                self.watcher.touch(event.dest_path)
@@ -0,0 +1,211 @@
+import posixpath
+import re
+import zipfile
+from array import array
+from xml.etree.ElementTree import iterparse
+
+# Reads the first sheet of a plain xlsx file straight from the zip, with one
+# iterparse pass over the sheet and one over the shared strings, and returns
+# the same columns pd.read_excel(filepath) would: a dict of column name to
+# array("q") for whole numbers, array("d") for other numbers and a list for
+# text. Anything this does not handle the way pandas does (empty cells,
+# dates, booleans, formulas with errors, text pandas would turn into numbers
+# or NaN) raises Unsupported, and the caller reads the file with pandas.
+
+MAIN="{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+RELATIONSHIPS="{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE="{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# text pandas reads as a missing value or a boolean
+NA_VALUES={"","#N/A","#N/A N/A","#NA","-1.#IND","-1.#QNAN","-NaN","-nan","1.#IND","1.#QNAN",
+           "<NA>","N/A","NA","NULL","NaN","None","n/a","nan","null",
+           "True","TRUE","true","False","FALSE","false"}
+
+# built-in number formats that show a date or a time
+DATE_FORMATS=set(range(14,23))|set(range(45,48))
+
+INTEGER=re.compile(r"-?(0|[1-9][0-9]{0,17})")
+REFERENCE=re.compile(r"[A-Z]+")
+
+
+class Unsupported(Exception):
+    pass
+
+
+def column_number(reference):
+    number=0
+    for letter in REFERENCE.match(reference).group():
+        number=number*26+ord(letter)-64
+    return number-1
+
+
+def _relationships(archive,part):
+    # relationship id -> part name, for the .rels file that belongs to part
+    directory,name=posixpath.split(part)
+    targets={}
+    with archive.open(posixpath.join(directory,"_rels",name+".rels")) as file:
+        for _,element in iterparse(file):
+            if element.tag==PACKAGE+"Relationship":
+                target=element.get("Target")
+                if target.startswith("/"):
+                    target=target[1:]
+                else:
+                    target=posixpath.normpath(posixpath.join(directory,target))
+                targets[element.get("Id")]=(element.get("Type").rsplit("/",1)[-1],target)
+    return targets
+
+
+def _first_sheet(archive):
+    with archive.open("xl/workbook.xml") as file:
+        for _,element in iterparse(file):
+            if element.tag==MAIN+"sheet":
+                sheet=element.get(RELATIONSHIPS+"id")
+                break
+        else:
+            raise Unsupported("no sheets")
+    targets=_relationships(archive,"xl/workbook.xml")
+    parts={kind:target for kind,target in targets.values()}
+    return targets[sheet][1],parts.get("sharedStrings"),parts.get("styles")
+
+
+def _shared_strings(archive,part):
+    strings=[]
+    if part is None:
+        return strings
+    with archive.open(part) as file:
+        for _,element in iterparse(file):
+            if element.tag==MAIN+"si":
+                # plain text, or the runs of rich text without phonetic hints
+                text=element.find(MAIN+"t")
+                if text is not None:
+                    strings.append(text.text or "")
+                else:
+                    strings.append("".join(run.findtext(MAIN+"t") or "" for run in element.iter(MAIN+"r")))
+                element.clear()
+    return strings
+
+
+def _date_styles(archive,part):
+    # numbers of the cell styles that show numbers as dates
+    if part is None:
+        return set()
+    formats={}
+    styles=[]
+    with archive.open(part) as file:
+        for _,element in iterparse(file):
+            if element.tag==MAIN+"numFmt":
+                code=re.sub(r'"[^"]*"|\[[^\]]*\]|\\.',"",element.get("formatCode",""))
+                formats[int(element.get("numFmtId"))]=bool(re.search("[dmyhs]",code,re.I))
+            elif element.tag==MAIN+"cellXfs":
+                styles=[int(xf.get("numFmtId",0)) for xf in element.iter(MAIN+"xf")]
+    return {number for number,style in enumerate(styles)
+            if formats.get(style,style in DATE_FORMATS)}
+
+
+def _number(text):
+    if "." not in text and "e" not in text and "E" not in text:
+        return int(text)
+    value=float(text)
+    # pandas hands whole numbers over as integers
+    return int(value) if value.is_integer() else value
+
+
+def _column(name,values):
+    kinds={type(value) for value in values}
+    if kinds<={int}:
+        return array("q",values)
+    if kinds<={int,float}:
+        return array("d",values)
+    if kinds!={str}:
+        raise Unsupported(f"{name} mixes text and numbers")
+    # pandas turns text columns that are all whole numbers into numbers
+    if all(INTEGER.fullmatch(value) for value in values):
+        return array("q",map(int,values))
+    for value in values:
+        if _unusual(value) or not INTEGER.fullmatch(value) and _looks_numeric(value):
+            raise Unsupported(f"{name} has {value!r}")
+    return values
+
+
+def _unusual(text):
+    # missing values and booleans to pandas, or escaped characters
+    return text in NA_VALUES or "_x" in text
+
+
+def _looks_numeric(value):
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def read(filepath):
+    try:
+        archive=zipfile.ZipFile(filepath)
+    except zipfile.BadZipFile as error:
+        raise Unsupported(str(error))
+    with archive:
+        try:
+            sheet,shared,styles=_first_sheet(archive)
+            strings=_shared_strings(archive,shared)
+            dates=_date_styles(archive,styles)
+            rows=_rows(archive,sheet,strings,dates)
+        except (KeyError,ValueError,IndexError) as error:
+            raise Unsupported(f"{type(error).__name__}: {error}")
+    if not rows:
+        raise Unsupported("empty sheet")
+    header,*rows=rows
+    if any(not isinstance(name,str) or _unusual(name) or _looks_numeric(name) for name in header):
+        raise Unsupported("header is not all text")
+    if len(set(header))!=len(header):
+        raise Unsupported("repeated column names")
+    if not rows or any(len(row)!=len(header) or None in row for row in rows):
+        raise Unsupported("empty cells")
+    try:
+        return {name:_column(name,[row[number] for row in rows]) for number,name in enumerate(header)}
+    except OverflowError as error:
+        raise Unsupported(str(error))
+
+
+def _rows(archive,part,strings,dates):
+    # values of the rows that have any, from the first column to the last
+    # one with a value; None for empty cells in between
+    rows=[]
+    with archive.open(part) as file:
+        row={}
+        for _,element in iterparse(file):
+            tag=element.tag
+            if tag==MAIN+"c":
+                kind=element.get("t","n")
+                value=element.findtext(MAIN+"v")
+                if kind=="inlineStr":
+                    value="".join(text.text or "" for text in element.iter(MAIN+"t"))
+                elif value is None:
+                    pass
+                elif kind=="s":
+                    value=strings[int(value)]
+                elif kind=="str":
+                    pass
+                elif kind=="n":
+                    if int(element.get("s",0)) in dates:
+                        raise Unsupported("dates")
+                    value=_number(value)
+                else:
+                    raise Unsupported(f"cells of type {kind}")
+                if value is not None:
+                    reference=element.get("r")
+                    row[column_number(reference) if reference else len(row)]=value
+                element.clear()
+            elif tag==MAIN+"row":
+                if row:
+                    # pandas takes the first row of the sheet as the header,
+                    # even an empty one, and keeps empty rows between others
+                    if int(element.get("r",len(rows)+1))!=len(rows)+1:
+                        raise Unsupported("empty rows")
+                    if min(row)!=0:
+                        raise Unsupported("first column is empty")
+                    rows.append([row.get(number) for number in range(max(row)+1)])
+                    row={}
+                element.clear()
+    return rows
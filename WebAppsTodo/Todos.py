@@ -1,21 +1,82 @@
 import streamlit as st
 import functions as fn
+
+# Only one page of todos is read from the store and turned into checkboxes,
+# so a rerun costs the same no matter how long the list gets.
+PAGE_SIZE=50
+
+@st.cache_resource
+def open_store(filepath="todos.txt"):
+    return fn.get_store(filepath)
+
 st.title('To-Do List')
 st.header('Add your task ')
-todos=fn.get_todos()
+# The store stays loaded across reruns and sessions; refresh only goes back
+# to the file when its size or mtime moved.
+store=open_store()
+store.refresh()
 def add_todos():
     todo=st.session_state["new_todo"]+"\n"
-    todos.append(todo)
-    fn.write_todos(todos)
-
-for index, todo in enumerate(todos):
-    checklist=st.checkbox(key=index, label=todo)
-    if checklist:
-        todos.pop(index)
-        fn.write_todos(todos)
-        del st.session_state[index]
+    store.add(todo)
+
+query=st.text_input(label="Search",placeholder='Filter your tasks',key='query')
+total=store.count(query)
+pages=max(1,-(-total//PAGE_SIZE))
+if st.session_state.get("page",1)>pages:
+    st.session_state["page"]=pages
+page=st.number_input(label="Page",min_value=1,max_value=pages,step=1,key='page')
+offset=(page-1)*PAGE_SIZE
+
+def clear_selection(ids):
+    for todo_id in ids:
+        st.session_state.pop(f"todo-{todo_id}",None)
+        st.session_state.pop(f"edit-{todo_id}",None)
+
+# Widgets are keyed on the todo's id in the store, so completing one leaves
+# every other checkbox's state where it was. Ticking boxes only selects; the
+# buttons apply the whole selection to the store in one write and one rerun.
+with st.form("todos"):
+    selected={}
+    for todo_id, todo in store.page(offset,PAGE_SIZE,query):
+        checklist=st.checkbox(key=f"todo-{todo_id}", label=todo)
+        if checklist:
+            selected[todo_id]=todo
+    left,right=st.columns(2)
+    complete=left.form_submit_button("Complete selected")
+    edit=right.form_submit_button("Edit selected")
+if complete and selected:
+    store.complete_ids(selected,selected)
+    clear_selection(selected)
+    st.rerun()
+if edit and selected:
+    st.session_state["editing"]=selected
+
+editing=st.session_state.get("editing")
+if editing:
+    with st.form("edit"):
+        changes={}
+        for todo_id, todo in editing.items():
+            text=st.text_input(label="Task",value=todo.strip("\n"),key=f"edit-{todo_id}")
+            if text!=todo.strip("\n"):
+                changes[todo_id]=text
+        left,right=st.columns(2)
+        save=left.form_submit_button("Save")
+        cancel=right.form_submit_button("Cancel")
+    if save or cancel:
+        if save and changes:
+            store.edit_ids(changes,editing)
+        del st.session_state["editing"]
+        clear_selection(editing)
         st.rerun()
-    
+
+st.caption(f"{total} tasks, page {page} of {pages}")
 st.text_input(label="Add",placeholder='Add your task',on_change=add_todos,key='new_todo')
 
-# st.session_state
\ No newline at end of file
+# Reads this session made since its last completed run, callbacks included;
+# a run cut short by st.rerun() is counted together with the one that
+# follows it. Other sessions' reruns read the shared store on their own
+# threads and are not counted here.
+reads=fn.thread_stats(reset=True)["reads"]
+st.sidebar.caption(f"Store reads this interaction: {reads}")
+
+# st.session_state
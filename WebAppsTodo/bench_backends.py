@@ -0,0 +1,64 @@
+# Compares the text (journal) store with the SQLite store on add, complete
+# and fetching one page from the middle of the list.
+#
+#   python bench_backends.py --sizes 1000 100000 1000000
+import argparse
+import os
+import tempfile
+import time
+
+import functions
+
+
+def seed(directory,size):
+    filepath=os.path.join(directory,"todos.txt")
+    with open(filepath,"w") as file:
+        file.writelines(f"todo number {n}\n" for n in range(size))
+    return filepath
+
+
+def timed(ops,action):
+    began=time.perf_counter()
+    for n in range(ops):
+        action(n)
+    return (time.perf_counter()-began)/ops*1e6
+
+
+def run(backend,size,ops,sync_window):
+    with tempfile.TemporaryDirectory() as directory:
+        filepath=seed(directory,size)
+        began=time.perf_counter()
+        store=functions.BACKENDS[backend](filepath,sync_window=sync_window)
+        opened=time.perf_counter()-began
+        add=timed(ops,lambda n: store.add(f"new todo {n}"))
+        complete=timed(ops,lambda n: store.complete(store.count()//2))
+        by_id=""
+        if backend=="sqlite":
+            ids=[row[0] for row in store._db.execute("SELECT id FROM todos WHERE completed IS NULL "
+                                                     "ORDER BY id DESC LIMIT ?",(ops,))]
+            by_id=f"{timed(ops,lambda n: store.complete_id(ids[n])):>10.0f}us"
+
+        def page(n):
+            store.refresh()
+            store.page(store.count()//2,50)
+        listing=timed(ops,page)
+        if backend=="sqlite":
+            store._db.close()
+    print(f"{backend:>6} {size:>9} {opened:>8.2f}s {add:>10.0f}us {complete:>10.0f}us {listing:>10.0f}us {by_id}")
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--sizes",type=int,nargs="+",default=[1000,100000])
+    parser.add_argument("--ops",type=int,default=200)
+    parser.add_argument("--sync-window",type=float,default=None,
+                        help="group commit window for the text store (default: fsync every write)")
+    args=parser.parse_args()
+    print(f"{'store':>6} {'items':>9} {'open':>9} {'add':>12} {'complete':>12} {'list-page':>12} {'complete-id':>12}")
+    for size in args.sizes:
+        for backend in ("text","sqlite"):
+            run(backend,size,args.ops,args.sync_window)
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,106 @@
+# Stress test for the todo store: N writer processes add todos to one shared
+# file at the same time, then the file is checked for lost updates.
+#
+#   python bench_store.py --processes 8 --writes 200
+#   python bench_store.py --mode legacy    # the old read/rewrite functions
+#   python bench_store.py --mode mixed     # complete and edit by index and text
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import functions
+
+
+def legacy_get(filepath):
+    with open(filepath,"r") as file:
+        return file.readlines()
+
+
+def legacy_write(todos,filepath):
+    with open(filepath,"w") as file:
+        file.writelines(todos)
+
+
+def seed(worker,i):
+    return f"seed{worker}-{i}\n"
+
+
+def mixed(filepath,worker,writes,compact_every):
+    # Each worker completes its even seeds and edits its odd ones, by the
+    # index it saw in a list that other workers keep changing, plus the text
+    # it saw there. Small compact_every keeps compactions racing with it.
+    store=functions.TodoStore(filepath,compact_every=compact_every)
+    for i in range(writes):
+        store.refresh()
+        todos=store.todos
+        index=todos.index(seed(worker,i))
+        if i%2:
+            store.edit(index,f"edited{worker}-{i}\n",old=todos[index])
+        else:
+            store.complete(index,old=todos[index])
+
+
+def writer(mode,filepath,worker,writes,start,compact_every):
+    start.wait()
+    if mode=="mixed":
+        mixed(filepath,worker,writes,compact_every)
+        return
+    for i in range(writes):
+        todo=f"worker{worker}-{i}\n"
+        if mode=="store":
+            functions.get_store(filepath).add(todo)
+        elif mode=="shim":
+            todos=functions.get_todos(filepath)
+            todos.append(todo)
+            functions.write_todos(todos,filepath)
+        else:
+            todos=legacy_get(filepath)
+            todos.append(todo)
+            legacy_write(todos,filepath)
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--processes",type=int,default=os.cpu_count())
+    parser.add_argument("--writes",type=int,default=200)
+    parser.add_argument("--mode",choices=["store","shim","legacy","mixed"],default="store")
+    parser.add_argument("--compact-every",type=int,default=50,help="compaction interval for --mode mixed")
+    args=parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filepath=os.path.join(directory,"todos.txt")
+        # mixed works on seeds interleaved across workers
+        with open(filepath,"w") as file:
+            if args.mode=="mixed":
+                file.writelines(seed(n,i) for i in range(args.writes) for n in range(args.processes))
+        start=multiprocessing.Event()
+        workers=[multiprocessing.Process(target=writer,args=(args.mode,filepath,n,args.writes,start,
+                                                             args.compact_every))
+                 for n in range(args.processes)]
+        for process in workers:
+            process.start()
+        began=time.perf_counter()
+        start.set()
+        for process in workers:
+            process.join()
+        elapsed=time.perf_counter()-began
+
+        if args.mode=="legacy":
+            todos=legacy_get(filepath)
+        else:
+            todos=functions.TodoStore(filepath).todos
+        expected=args.processes*args.writes
+        found=len(set(todos))
+        if args.mode=="mixed":
+            # every odd seed edited, every even one gone, nothing else left
+            wanted={f"edited{n}-{i}\n" for n in range(args.processes) for i in range(1,args.writes,2)}
+            found=expected-len(wanted-set(todos))-len(set(todos)-wanted)-(len(todos)-len(set(todos)))
+        print(f"mode={args.mode} processes={args.processes} writes/process={args.writes}")
+        print(f"{expected} writes in {elapsed:.2f}s, {expected/elapsed:.0f} writes/s")
+        print(f"lost updates: {expected-found}")
+
+
+if __name__=="__main__":
+    main()
@@ -1,7 +1,927 @@
+import atexit
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+
+if os.name=="nt":
+    import msvcrt
+else:
+    import fcntl
+
+# The snapshot keeps the plain todos.txt format (one todo per line) and every
+# change after it is appended to todos.txt.log as one JSON record per line.
+# Once the log holds COMPACT_EVERY records it is folded back into the snapshot.
+COMPACT_EVERY=1000
+# Seconds to gather log appends into one fsync (group commit). None syncs
+# every write on its own.
+SYNC_WINDOW=float(os.environ["TODOS_SYNC_WINDOW"]) if os.environ.get("TODOS_SYNC_WINDOW") else None
+# Store used for todos.txt style paths, see BACKENDS. Paths ending in .db or
+# .sqlite always use the SQLite store.
+BACKEND=os.environ.get("TODOS_BACKEND","text")
+
+# How often the stores went to disk, for checking how many reads an
+# interaction costs: in the whole process, and per thread in thread_stats.
+stats={"reads":0,"writes":0}
+_thread_stats=threading.local()
+# With RETURNING a transaction gets the new version and open count back
+# from its last write, so it needs no read afterwards.
+RETURNING=sqlite3.sqlite_version_info>=(3,35)
+
+
+def _count(kind):
+    stats[kind]+=1
+    setattr(_thread_stats,kind,getattr(_thread_stats,kind,0)+1)
+
+
+def thread_stats(reset=False):
+    # stats for the calling thread alone. Streamlit runs each session's
+    # callbacks and script in that session's thread, so these leave out
+    # reads made for other sessions sharing the store.
+    counts={kind:getattr(_thread_stats,kind,0) for kind in stats}
+    if reset:
+        _thread_stats.__dict__.clear()
+    return counts
+
+
+class TodoList(list):
+    # What get_todos hands out: a plain list that remembers which version of
+    # the store it was read at, so write_todos can merge instead of clobber.
+    version=None
+    base=None
+
+
+class TodoStore:
+    # Todos live in self.items, a dict from a stable id to the todo's line in
+    # list order, so completing one is a dict pop and nobody else's id moves.
+    # The snapshot has no room for ids: a todo's id is its line number unless
+    # the log's base record says otherwise, or the log is for another
+    # snapshot (see load).
+    def __init__(self,filepath="todos.txt",compact_every=COMPACT_EVERY,sync_window=None):
+        self.filepath=filepath
+        self.logpath=filepath+".log"
+        self.lockpath=filepath+".lock"
+        self.compact_every=compact_every
+        self.sync_window=sync_window
+        self._sync_lock=threading.Lock()
+        self._sync_timer=None
+        self._thread_lock=threading.RLock()
+        self._lock_depth=0
+        self._lock_file=None
+        self.load()
+
+    def load(self):
+        # ids this store may have handed out already, and how the lines of
+        # the last snapshot read without its log were numbered
+        floor=getattr(self,"_next_id",1)
+        previous=getattr(self,"_snapshot_ids",{})
+        data=b""
+        self._stat=None
+        try:
+            file=open(self.filepath,"rb")
+        except FileNotFoundError:
+            pass
+        else:
+            with file:
+                # stat of the file that was read, not of whatever replaced
+                # it since
+                self._stat=_file_stat(os.fstat(file.fileno()))
+                data=file.read()
+            _count("reads")
+        todos=data.decode().splitlines(keepends=True)
+        self.items=dict(zip(range(1,len(todos)+1),todos))
+        self._next_id=len(todos)+1
+        self._base=hashlib.sha1(data).hexdigest()
+        self._offset=0
+        self._torn=False
+        self._stale_log=False
+        # ids of the snapshot's lines when they are not their line numbers,
+        # for the base record of a new log
+        self._snapshot_ids={}
+        self._view=None
+        self.version=0
+        self.records=0
+        self._replay()
+        if self._stale_log:
+            # Line numbers are only ids under the log that goes with this
+            # snapshot. Without it they could name other todos than the
+            # ones callers hold ids for, so number from above those.
+            # The same snapshot keeps the same ids.
+            if previous.get("sha1")==self._base:
+                first=previous["ids"][0][0]
+            else:
+                first=max(self._next_id,floor)
+            self.items=dict(zip(itertools.count(first),self.items.values()))
+            self._next_id=max(floor,first+len(self.items))
+            self._snapshot_ids={"sha1":self._base,"ids":[[first,len(self.items)]],"next_id":self._next_id}
+
+    def refresh(self):
+        # Two stat calls when nothing changed; files are only read when
+        # another writer touched them.
+        with self._thread_lock:
+            if self._snapshot_stat()!=self._stat:
+                self.load()
+            else:
+                self._replay()
+            if self._stale_log:
+                # The log starts from another snapshot: either this one was
+                # read just before another process compacted, or a crash hit
+                # between the two writes of a compaction. Reading the
+                # snapshot again settles which; under the lock, a log that
+                # still does not match is dropped on the next write.
+                self.load()
+
+    # Readers hold the thread lock too: a store shared between threads (one
+    # per Streamlit session) must not be iterated while another thread's
+    # refresh or write changes items.
+    @property
+    def todos(self):
+        with self._thread_lock:
+            return list(self.items.values())
+
+    def view(self):
+        # One shared read-only copy per version for get_todos callers to diff against.
+        with self._thread_lock:
+            if self._view is None or self._view[0]!=self.version:
+                self._view=(self.version,tuple(self.items.values()))
+            return self._view
+
+    def get(self,todo_id):
+        return self.items.get(todo_id)
+
+    def count(self,query=None):
+        with self._thread_lock:
+            if not query:
+                return len(self.items)
+            return sum(1 for _ in self._matching(query))
+
+    def page(self,offset,limit,query=None):
+        # (id, todo) pairs for one slice of the list; a query filters on
+        # substring, ignoring case.
+        with self._thread_lock:
+            items=self._matching(query) if query else iter(self.items.items())
+            return list(itertools.islice(items,offset,offset+limit))
+
+    def _matching(self,query):
+        query=query.casefold()
+        return ((todo_id,todo) for todo_id,todo in self.items.items() if query in todo.casefold())
+
+    def export_text(self,filepath):
+        _atomic_write(filepath,"".join(self.items.values()).encode())
+
+    def _snapshot_stat(self):
+        try:
+            return _file_stat(os.stat(self.filepath))
+        except FileNotFoundError:
+            return None
+
+    @contextlib.contextmanager
+    def _locked(self):
+        # Advisory lock on todos.txt.lock shared by every process using the
+        # store; re-entrant within the process.
+        with self._thread_lock:
+            if self._lock_depth==0:
+                self._lock_file=open(self.lockpath,"a+b")
+                _lock(self._lock_file)
+            self._lock_depth+=1
+            try:
+                yield
+            finally:
+                self._lock_depth-=1
+                if self._lock_depth==0:
+                    _unlock(self._lock_file)
+                    self._lock_file.close()
+                    self._lock_file=None
+
+    def _replay(self):
+        self._torn=False
+        try:
+            if os.stat(self.logpath).st_size==self._offset:
+                return
+            log=open(self.logpath,"rb")
+        except FileNotFoundError:
+            return
+        _count("reads")
+        with log:
+            log.seek(self._offset)
+            for line in log:
+                if not line.endswith(b"\n"):
+                    # torn tail from a crash mid-append (or an append still in
+                    # progress), dropped on the next locked write
+                    self._torn=True
+                    break
+                record=json.loads(line)
+                self._offset+=len(line)
+                if record["op"]=="base":
+                    if record["sha1"]!=self._base:
+                        # log belongs to another snapshot, see refresh
+                        self._offset=0
+                        self._torn=True
+                        self._stale_log=True
+                        return
+                    self.version=record.get("version",0)
+                    if "ids" in record:
+                        self.items=dict(zip(_expand(record["ids"]),self.items.values()))
+                        self._next_id=record["next_id"]
+                    continue
+                if "id" not in record:
+                    # written before todos had ids
+                    record=self._resolve(record)
+                if record is not None:
+                    self._apply(record)
+                self.version+=1
+                self.records+=1
+
+    def _apply(self,record):
+        op=record["op"]
+        todo_id=record["id"]
+        if op=="add":
+            self._next_id=max(self._next_id,todo_id+1)
+            before=record.get("before")
+            if before in self.items:
+                items={}
+                for key,todo in self.items.items():
+                    if key==before:
+                        items[todo_id]=record["text"]
+                    items[key]=todo
+                self.items=items
+            else:
+                self.items[todo_id]=record["text"]
+        elif op=="edit":
+            if todo_id in self.items:
+                self.items[todo_id]=record["text"]
+        elif op=="complete":
+            self.items.pop(todo_id,None)
+
+    def _id_at(self,index):
+        return next(itertools.islice(self.items,index,None))
+
+    def _find(self,todo,index):
+        # Id of the occurrence of todo closest to index, or None.
+        best=None
+        for position,(todo_id,item) in enumerate(self.items.items()):
+            if item==todo and (best is None or abs(position-index)<abs(best[0]-index)):
+                best=position,todo_id
+        return best and best[1]
+
+    def _resolve(self,record,rebase=False):
+        # Turn a record that points at a todo by index (and optionally the
+        # text expected there) into one that points at it by id. Returns
+        # None when that todo is gone. Adds from a stale list go to the end.
+        record=dict(record)
+        index=record.pop("index",None)
+        old=record.pop("old",None)
+        if record["op"]=="add":
+            record["id"]=self._next_id
+            if index is not None and index<len(self.items) and not rebase:
+                record["before"]=self._id_at(index)
+            return record
+        todo_id=self._id_at(index) if 0<=index<len(self.items) else None
+        if old is not None and self.items.get(todo_id)!=old:
+            todo_id=self._find(old,index)
+        if todo_id is None:
+            return None
+        record["id"]=todo_id
+        return record
+
+    def _check(self,record):
+        # An id record, with the text the caller saw under that id as old.
+        # Returns None when the todo is gone. Ids from a list read while the
+        # snapshot and log did not match may be missing or name another
+        # todo; with old the text finds the todo, as for index records.
+        record=dict(record)
+        old=record.pop("old",None)
+        todo_id=record["id"]
+        if todo_id in self.items and (old is None or self.items[todo_id]==old):
+            return record
+        if old is None:
+            # completed by another writer in the meantime
+            return None
+        record["id"]=self._find(old,0)
+        return record if record["id"] is not None else None
+
+    def _commit(self,records,version=None):
+        # Apply and log records under the lock, returning the ones that still
+        # had a todo to act on.
+        with self._locked():
+            self.refresh()
+            rebase=version is not None and version!=self.version
+            committed=[]
+            for record in records:
+                if "id" not in record:
+                    record=self._resolve(record,rebase)
+                elif record["op"]!="add":
+                    record=self._check(record)
+                if record is None:
+                    continue
+                self._apply(record)
+                committed.append(record)
+            if committed:
+                self._write(committed)
+            return committed
+
+    def _write(self,records):
+        if self._torn:
+            os.truncate(self.logpath,self._offset)
+            self._torn=False
+        data=records
+        if self._offset==0:
+            data=[{"op":"base","sha1":self._base,"version":self.version,**self._snapshot_ids}]+records
+        data="".join(json.dumps(record)+"\n" for record in data).encode()
+        with open(self.logpath,"ab") as log:
+            log.write(data)
+            log.flush()
+            if self.sync_window is None:
+                os.fsync(log.fileno())
+        _count("writes")
+        if self.sync_window is not None:
+            self._schedule_sync()
+        self._offset+=len(data)
+        self.version+=len(records)
+        self.records+=len(records)
+        if self.records>=self.compact_every:
+            self.compact()
+
+    def add(self,todo):
+        # Returns the new todo's id.
+        return self._commit([{"op":"add","text":_line(todo)}])[0]["id"]
+
+    def edit(self,index,todo,old=None):
+        # Pass the text the caller saw at index as old to have the edit land
+        # on that todo even if another writer moved it.
+        return self.edit_many({index:todo},{index:old})
+
+    def complete(self,index,old=None):
+        return self.complete_many([index],{index:old})
+
+    def complete_many(self,indices,olds=None):
+        # One locked append for the whole batch. olds maps an index to the
+        # text the caller saw there, as with complete.
+        olds=olds or {}
+        with self._locked():
+            self.refresh()
+            records=[self._resolve({"op":"complete","index":self._index(index,olds.get(index)),
+                                    "old":olds.get(index)}) for index in indices]
+            return len(self._commit([record for record in records if record]))
+
+    def edit_many(self,changes,olds=None):
+        # changes maps an index to its new text.
+        olds=olds or {}
+        with self._locked():
+            self.refresh()
+            records=[self._resolve({"op":"edit","index":self._index(index,olds.get(index)),
+                                    "text":_line(todo),"old":olds.get(index)})
+                     for index,todo in changes.items()]
+            return len(self._commit([record for record in records if record]))
+
+    def _index(self,index,old):
+        # Negative indices count from the end. Past the end is only an error
+        # without old text: the list may have shrunk under a caller that can
+        # still say which todo it meant.
+        if old is None:
+            return range(len(self.items))[index]
+        return index+len(self.items) if index<0 else index
+
+    def complete_id(self,todo_id):
+        return self.complete_ids([todo_id])
+
+    def edit_id(self,todo_id,todo):
+        return self.edit_ids({todo_id:todo})
+
+    def complete_ids(self,ids,olds=None):
+        # olds maps an id to the text the caller saw under it, so a todo
+        # whose id the caller got wrong is found by its text instead.
+        olds=olds or {}
+        return len(self._commit([{"op":"complete","id":todo_id,"old":olds.get(todo_id)} for todo_id in ids]))
+
+    def edit_ids(self,changes,olds=None):
+        olds=olds or {}
+        return len(self._commit([{"op":"edit","id":todo_id,"text":_line(todo),"old":olds.get(todo_id)}
+                                 for todo_id,todo in changes.items()]))
+
+    def replace(self,todos,base=None,version=None):
+        # Turn a whole new list (the old write_todos call) into the few log
+        # records that differ from base, the list the caller started from.
+        # Records carry the text they expect so they can be merged onto
+        # whatever other writers committed since that version.
+        with self._locked():
+            self.refresh()
+            if base is None or version==self.version:
+                base,version=self.todos,None
+            records=_diff(base,todos)
+            if version is None and len(records)>len(todos)//2+1:
+                self.compact(list(todos))
+                return len(records)
+            return len(self._commit(records,version))
+
+    def _schedule_sync(self):
+        with self._sync_lock:
+            if self._sync_timer is None:
+                self._sync_timer=threading.Timer(self.sync_window,self.sync)
+                self._sync_timer.daemon=True
+                self._sync_timer.start()
+
+    def sync(self):
+        with self._sync_lock:
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+                self._sync_timer=None
+            if os.path.exists(self.logpath):
+                with open(self.logpath,"ab") as log:
+                    os.fsync(log.fileno())
+
+    def compact(self,todos=None):
+        with self._locked():
+            if todos is None:
+                self.refresh()
+            else:
+                self.items={}
+                for todo in todos:
+                    self.items[self._next_id]=todo
+                    self._next_id+=1
+                self.version+=1
+            data="".join(self.items.values()).encode()
+            _atomic_write(self.filepath,data)
+            _count("writes")
+            self._base=hashlib.sha1(data).hexdigest()
+            self._stat=self._snapshot_stat()
+            self._stale_log=False
+            header={"op":"base","sha1":self._base,"version":self.version,
+                    "ids":_ranges(self.items),"next_id":self._next_id}
+            header=(json.dumps(header)+"\n").encode()
+            with self._sync_lock:
+                _atomic_write(self.logpath,header)
+            self._offset=len(header)
+            self._torn=False
+            self.records=0
+
+
+class SqliteStore:
+    # Same interface as TodoStore, backed by an SQLite database in WAL mode.
+    # Completed todos keep their row with a completed timestamp; the open list
+    # is every row without one, ordered by position.
+    def __init__(self,filepath="todos.db",**options):
+        root,ext=os.path.splitext(filepath)
+        self.filepath=filepath if ext in SQLITE_SUFFIXES else root+".db"
+        textpath=filepath if self.filepath!=filepath else None
+        new=not os.path.exists(self.filepath)
+        self._thread_lock=threading.RLock()
+        self._db=sqlite3.connect(self.filepath,check_same_thread=False,isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS todos(
+                id INTEGER PRIMARY KEY,
+                text TEXT NOT NULL,
+                created REAL NOT NULL,
+                completed REAL,
+                position REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS todos_open ON todos(completed,position);
+            CREATE INDEX IF NOT EXISTS todos_position ON todos(position);
+            CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY,value);
+            INSERT OR IGNORE INTO meta VALUES('version',0);
+            INSERT OR IGNORE INTO meta VALUES('open',0);
+        """)
+        self._view=None
+        self._data_version=None
+        self._results={}
+        self.version=None
+        if new and textpath and os.path.exists(textpath):
+            with open(textpath,"rb") as file:
+                todos=file.read().decode().splitlines(keepends=True)
+            with self._transaction():
+                now=time.time()
+                self._db.executemany("INSERT INTO todos(text,created,position) VALUES(?,?,?)",
+                                     ((todo,now,position) for position,todo in enumerate(todos)))
+                self._db.execute("UPDATE meta SET value=? WHERE key='open'",(len(todos),))
+        self._reload()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._thread_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                meta=None
+                if RETURNING:
+                    meta=self._db.execute("UPDATE meta SET value=value+1 WHERE key='version' "
+                                          "RETURNING value,(SELECT value FROM meta WHERE key='open')").fetchone()
+                    # no other connection can commit before this one does
+                    data_version=self._db.execute("PRAGMA data_version").fetchone()[0]
+                else:
+                    self._db.execute("UPDATE meta SET value=value+1 WHERE key='version'")
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            if meta is None:
+                self._reload()
+            else:
+                self._data_version=data_version
+                self._set_meta(*meta)
+
+    def refresh(self):
+        # data_version only moves when another connection commits, so an
+        # unchanged database costs no read at all.
+        with self._thread_lock:
+            if self._db.execute("PRAGMA data_version").fetchone()[0]!=self._data_version:
+                self._reload()
+
+    def _reload(self):
+        self._data_version=self._db.execute("PRAGMA data_version").fetchone()[0]
+        meta=self._db.execute("SELECT (SELECT value FROM meta WHERE key='version'),"
+                              "(SELECT value FROM meta WHERE key='open')").fetchone()
+        _count("reads")
+        self._set_meta(*meta)
+
+    def _set_meta(self,version,open_count):
+        self._open=open_count
+        if version!=self.version:
+            self.version=version
+            self._results={}
+
+    def _read(self,sql,args=()):
+        # Query results are kept until the version changes.
+        with self._thread_lock:
+            key=(sql,args)
+            if key not in self._results:
+                self._results[key]=self._db.execute(sql,args).fetchall()
+                _count("reads")
+            return self._results[key]
+
+    @property
+    def todos(self):
+        rows=self._read("SELECT text FROM todos WHERE completed IS NULL ORDER BY position")
+        return [text for text, in rows]
+
+    def view(self):
+        self.refresh()
+        if self._view is None or self._view[0]!=self.version:
+            self._view=(self.version,tuple(self.todos))
+        return self._view
+
+    def get(self,todo_id):
+        rows=self._read("SELECT text FROM todos WHERE id=? AND completed IS NULL",(todo_id,))
+        return rows[0][0] if rows else None
+
+    def count(self,query=None):
+        if query:
+            return self._read("SELECT COUNT(*) FROM todos WHERE completed IS NULL "
+                              "AND text LIKE ? ESCAPE '\\'",(_like(query),))[0][0]
+        with self._thread_lock:
+            return self._open
+
+    def page(self,offset,limit,query=None):
+        if query:
+            rows=self._read("SELECT id,text FROM todos WHERE completed IS NULL "
+                            "AND text LIKE ? ESCAPE '\\' ORDER BY position "
+                            "LIMIT ? OFFSET ?",(_like(query),limit,offset))
+        else:
+            rows=self._read("SELECT id,text FROM todos WHERE completed IS NULL "
+                            "ORDER BY position LIMIT ? OFFSET ?",(limit,offset))
+        return list(rows)
+
+    def _open_count(self):
+        return self._db.execute("SELECT value FROM meta WHERE key='open'").fetchone()[0]
+
+    def export_text(self,filepath):
+        # Byte for byte what TodoStore would keep in todos.txt.
+        _atomic_write(filepath,"".join(self.todos).encode())
+
+    def _nth(self,index):
+        if index<0:
+            index+=self._open_count()
+        row=None
+        if index>=0:
+            row=self._db.execute("SELECT id,text,position FROM todos WHERE completed IS NULL "
+                                 "ORDER BY position LIMIT 1 OFFSET ?",(index,)).fetchone()
+        if row is None:
+            raise IndexError("todo index out of range")
+        return row
+
+    def _find(self,todo):
+        row=self._db.execute("SELECT id FROM todos WHERE completed IS NULL AND text=? "
+                             "ORDER BY position LIMIT 1",(todo,)).fetchone()
+        return row and row[0]
+
+    def _position(self,index):
+        # Position that puts a new row at index in the open list.
+        rows=self._db.execute("SELECT position FROM todos WHERE completed IS NULL "
+                              "ORDER BY position LIMIT 2 OFFSET ?",(max(index-1,0),)).fetchall()
+        if index==0:
+            return rows[0][0]-1 if rows else 0.0
+        if len(rows)==2:
+            return (rows[0][0]+rows[1][0])/2
+        return self._last_position()
+
+    def _last_position(self):
+        last=self._db.execute("SELECT MAX(position) FROM todos").fetchone()[0]
+        return 0.0 if last is None else last+1
+
+    def _apply(self,record,rebase=False):
+        op=record["op"]
+        if op=="add":
+            index=record.get("index")
+            if index is None or rebase or index>=self._open_count():
+                position=self._last_position()
+            else:
+                position=self._position(index)
+            self._db.execute("INSERT INTO todos(text,created,position) VALUES(?,?,?)",
+                             (record["text"],time.time(),position))
+            self._db.execute("UPDATE meta SET value=value+1 WHERE key='open'")
+            return True
+        todo_id=record.get("id")
+        if todo_id is None:
+            try:
+                todo_id,text,_=self._nth(record["index"])
+            except IndexError:
+                text=None
+            if "old" in record and text!=record["old"]:
+                todo_id=self._find(record["old"])
+                if todo_id is None:
+                    return False
+        elif record.get("old") is not None:
+            row=self._db.execute("SELECT text FROM todos WHERE id=? AND completed IS NULL",(todo_id,)).fetchone()
+            if row is None:
+                return False
+            if row[0]!=record["old"]:
+                todo_id=self._find(record["old"])
+                if todo_id is None:
+                    return False
+        if op=="edit":
+            cursor=self._db.execute("UPDATE todos SET text=? WHERE id=? AND completed IS NULL",
+                                    (record["text"],todo_id))
+        else:
+            cursor=self._db.execute("UPDATE todos SET completed=? WHERE id=? AND completed IS NULL",
+                                    (time.time(),todo_id))
+            if cursor.rowcount:
+                self._db.execute("UPDATE meta SET value=value-1 WHERE key='open'")
+        return cursor.rowcount>0
+
+    def _commit(self,records,version=None):
+        with self._transaction():
+            self.refresh()
+            rebase=version is not None and version!=self.version
+            return sum(self._apply(record,rebase) for record in records)
+
+    def add(self,todo):
+        # Returns the new todo's id.
+        with self._transaction():
+            self._apply({"op":"add","text":_line(todo)})
+            return self._db.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    def edit(self,index,todo,old=None):
+        with self._thread_lock:
+            todo_id=self._resolve(index,old)
+            return 0 if todo_id is None else self.edit_id(todo_id,todo)
+
+    def complete(self,index,old=None):
+        with self._thread_lock:
+            todo_id=self._resolve(index,old)
+            return 0 if todo_id is None else self.complete_id(todo_id)
+
+    def _resolve(self,index,old):
+        try:
+            todo_id,text,_=self._nth(index)
+        except IndexError:
+            # the list shrank under the caller; the text still finds the todo
+            if old is None:
+                raise
+            return self._find(old)
+        if old is not None and text!=old:
+            return self._find(old)
+        return todo_id
+
+    def edit_id(self,todo_id,todo):
+        return self.edit_ids({todo_id:todo})
+
+    def complete_id(self,todo_id):
+        return self.complete_ids([todo_id])
+
+    def complete_ids(self,ids,olds=None):
+        olds=olds or {}
+        return self._commit([{"op":"complete","id":todo_id,"old":olds.get(todo_id)} for todo_id in ids])
+
+    def edit_ids(self,changes,olds=None):
+        olds=olds or {}
+        return self._commit([{"op":"edit","id":todo_id,"text":_line(todo),"old":olds.get(todo_id)}
+                             for todo_id,todo in changes.items()])
+
+    def complete_many(self,indices,olds=None):
+        # Rows are looked up before any is completed so the indices all refer
+        # to the list as the caller saw it; one transaction for the batch.
+        olds=olds or {}
+        with self._transaction():
+            ids={self._resolve(index,olds.get(index)) for index in indices}
+            return sum(self._apply({"op":"complete","id":todo_id}) for todo_id in ids if todo_id is not None)
+
+    def edit_many(self,changes,olds=None):
+        olds=olds or {}
+        with self._transaction():
+            edits=[(self._resolve(index,olds.get(index)),todo) for index,todo in changes.items()]
+            return sum(self._apply({"op":"edit","id":todo_id,"text":_line(todo)})
+                       for todo_id,todo in edits if todo_id is not None)
+
+    def replace(self,todos,base=None,version=None):
+        with self._thread_lock:
+            self.refresh()
+            if base is None or version==self.version:
+                base,version=self.todos,None
+            return self._commit(_diff(base,todos),version)
+
+    def sync(self):
+        pass
+
+    def compact(self):
+        with self._thread_lock:
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+class BackgroundWriter:
+    # Runs store calls on a worker thread, in the order they were submitted,
+    # so an event loop never waits on the disk. The caller keeps its own copy
+    # of the list up to date; failed calls are collected in errors.
+    def __init__(self,store):
+        self.store=store
+        self.errors=[]
+        self._queue=queue.Queue()
+        self._thread=threading.Thread(target=self._run,daemon=True)
+        self._thread.start()
+
+    def submit(self,method,*args,**kwargs):
+        self._queue.put((method,args,kwargs))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            call=self._queue.get()
+            try:
+                if call is None:
+                    return
+                method,args,kwargs=call
+                getattr(self.store,method)(*args,**kwargs)
+            except Exception as error:
+                self.errors.append(error)
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self.store.sync()
+
+
+SQLITE_SUFFIXES=(".db",".sqlite",".sqlite3")
+BACKENDS={"text":TodoStore,"sqlite":SqliteStore}
+
+
+def _diff(old,new):
+    start=0
+    while start<len(old) and start<len(new) and old[start]==new[start]:
+        start+=1
+    end=0
+    while (end<len(old)-start and end<len(new)-start
+           and old[-end-1]==new[-end-1]):
+        end+=1
+    removed=old[start:len(old)-end]
+    added=new[start:len(new)-end]
+    records=[]
+    for offset in range(min(len(removed),len(added))):
+        if removed[offset]!=added[offset]:
+            records.append({"op":"edit","index":start+offset,"text":added[offset],
+                            "old":removed[offset]})
+    for offset in range(len(added),len(removed)):
+        records.append({"op":"complete","index":start+len(added),"old":removed[offset]})
+    for offset in range(len(removed),len(added)):
+        records.append({"op":"add","index":start+offset,"text":added[offset]})
+    return records
+
+
+def _line(todo):
+    return todo if todo.endswith("\n") else todo+"\n"
+
+
+def _like(query):
+    escaped=query.replace("\\","\\\\").replace("%","\\%").replace("_","\\_")
+    return f"%{escaped}%"
+
+
+def _ranges(ids):
+    # [[first, length], ...] runs of consecutive ids, in order.
+    runs=[]
+    for todo_id in ids:
+        if runs and runs[-1][0]+runs[-1][1]==todo_id:
+            runs[-1][1]+=1
+        else:
+            runs.append([todo_id,1])
+    return runs
+
+
+def _expand(runs):
+    for first,length in runs:
+        yield from range(first,first+length)
+
+
+def _file_stat(st):
+    return st.st_size,st.st_mtime_ns
+
+
+def _lock(file):
+    if os.name=="nt":
+        file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file.fileno(),msvcrt.LK_LOCK,1)
+                return
+            except OSError:
+                pass
+    else:
+        fcntl.flock(file.fileno(),fcntl.LOCK_EX)
+
+
+def _unlock(file):
+    if os.name=="nt":
+        file.seek(0)
+        msvcrt.locking(file.fileno(),msvcrt.LK_UNLCK,1)
+    else:
+        fcntl.flock(file.fileno(),fcntl.LOCK_UN)
+
+
+def _atomic_write(filepath,data):
+    # Readers see either the old file or the new one, never a truncated one.
+    directory=os.path.dirname(os.path.abspath(filepath))
+    fd,tmppath=tempfile.mkstemp(dir=directory,prefix=".todos-",suffix=".tmp")
+    try:
+        with os.fdopen(fd,"wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(filepath):
+            os.chmod(tmppath,os.stat(filepath).st_mode)
+        os.replace(tmppath,filepath)
+    except BaseException:
+        os.remove(tmppath)
+        raise
+    if os.name=="posix":
+        dirfd=os.open(directory,os.O_RDONLY)
+        try:
+            os.fsync(dirfd)
+        finally:
+            os.close(dirfd)
+
+
+_stores={}
+
+
+@atexit.register
+def _sync_all():
+    for store in _stores.values():
+        store.sync()
+
+
+def get_store(filepath="todos.txt",backend=None):
+    if backend is None:
+        backend="sqlite" if filepath.endswith(SQLITE_SUFFIXES) else BACKEND
+    store=_stores.get((filepath,backend))
+    if store is None:
+        store=_stores[filepath,backend]=BACKENDS[backend](filepath,sync_window=SYNC_WINDOW)
+    else:
+        store.refresh()
+    return store
+
+
 def get_todos(filepath="todos.txt"):
-    with open(filepath,"r") as file_local:
-        todolocal=file_local.readlines()
-    return todolocal
+    version,base=get_store(filepath).view()
+    todos=TodoList(base)
+    todos.version=version
+    todos.base=base
+    return todos
+
+
 def write_todos(todo_arg,filepath="todos.txt"):
-    with open(filepath,"w") as file:
-        file.writelines(todo_arg)
\ No newline at end of file
+    get_store(filepath).replace(list(todo_arg),getattr(todo_arg,"base",None),
+                                getattr(todo_arg,"version",None))
+
+
+def complete_todos(indices,todos=None,filepath="todos.txt"):
+    # Complete several todos in one write. Pass the list from get_todos as
+    # todos so the right ones are completed even if the file moved on.
+    olds={index:todos[index] for index in indices} if todos is not None else None
+    return get_store(filepath).complete_many(indices,olds)
+
+
+def edit_todos(changes,todos=None,filepath="todos.txt"):
+    # changes maps an index to its new text.
+    olds={index:todos[index] for index in changes} if todos is not None else None
+    return get_store(filepath).edit_many(changes,olds)
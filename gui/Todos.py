@@ -1,53 +1,66 @@
 import functions
 import FreeSimpleGUI as fsg
+from listview import LazyListbox
+
+store=functions.get_store()
+# The window works on its own copy of the list and hands every change to a
+# worker thread, so no event waits on the disk and the file is never reread.
+writer=functions.BackgroundWriter(store)
+
 label=fsg.Text("Welcome to Todos")
-input_box=fsg.InputText(tooltip="Enter a new todo")
+input_box=fsg.InputText(tooltip="Enter a new todo",key="todo")
 add_button=fsg.Button("Add",tooltip="Add a new todo")
-window=fsg.Window("Todos",layout=[[label],[input_box,add_button]])
-window.read()
-window.close()
-# while True:
-#     user_action = input("type add, show, edit, complete or exit: ")
-#     user_action = user_action.strip()
+list_box=fsg.Listbox(values=[],key="todos",enable_events=True,size=(45,10))
+edit_button=fsg.Button("Edit",tooltip="Replace the selected todo")
+complete_button=fsg.Button("Complete",tooltip="Complete the selected todo")
+exit_button=fsg.Button("Exit")
+window=fsg.Window("Todos",layout=[[label],[input_box,add_button],
+                                  [list_box,edit_button,complete_button],
+                                  [exit_button]],finalize=True)
+
 
-#     if user_action.startswith("add"):   
-#         todo = user_action[4:]
-#         todos = functions.get_todos()
-#         todos.append(todo + "\n")
-#         functions.write_todos(todos)
-#     elif user_action.startswith("show"):
-#         todos = functions.get_todos()
-#         for index, i in enumerate(todos):
-#             i = i.strip("\n")
-#             row = f"{index + 1} - {i}"
-#             print(row)
-#     elif user_action.startswith("edit"):
-#         try:
-#             number = int(user_action[5:])
-#             number = number - 1
-#             todos = functions.get_todos()
-#             new_todo = input("Enter a new todo:")
-#             todos[number] = new_todo + "\n"
-#             functions.write_todos(todos)
-#         except ValueError:
-#             print("command is not valid")
-#             continue
+def show_errors():
+    # Store calls fail on the writer thread, after the window already showed
+    # the change; say which changes were not saved.
+    errors=[]
+    while writer.errors:
+        errors.append(str(writer.errors.pop(0)))
+    if errors:
+        fsg.popup_error("These changes could not be saved:",*errors)
 
-#     elif user_action.startswith("complete"):
-#         try:
-#             number = int(user_action[9:])
-#             todos = functions.get_todos()
-#             index = number - 1
-#             todo_to_remove = todos[index].strip("\n")
-#             todos.pop(index)
-#             functions.write_todos(todos)
-#             message = f"Todo{index} was removed from the list"
-#             print(message)
-#         except IndexError:
-#             print("Command is not valid")
-#             continue
-#     elif user_action.startswith("exit"):
-#         break
-#     else:
-#         print("Command is not valid")
-# print("Bye")
+
+# Rows are loaded into Tk as they are scrolled to and every change touches
+# a single row.
+todos=LazyListbox(list_box,store.todos)
+while True:
+    event,values=window.read(timeout=1000)
+    show_errors()
+    if event in (fsg.WIN_CLOSED,"Exit"):
+        break
+    selected=todos.selected()
+    if event=="Add":
+        todo=values["todo"].strip()
+        if todo:
+            todos.append(todo+"\n")
+            writer.submit("add",todo)
+            window["todo"].update(value="")
+    elif event=="Edit":
+        todo=values["todo"].strip()
+        if selected and todo:
+            index=selected[0]
+            # the old text lets the store find the todo if another process moved it
+            writer.submit("edit",index,todo,old=todos.todos[index])
+            todos.set(index,todo+"\n")
+    elif event=="Complete":
+        if selected:
+            index=selected[0]
+            writer.submit("complete",index,old=todos.todos[index])
+            todos.pop(index)
+            window["todo"].update(value="")
+    elif event=="todos":
+        if values["todos"]:
+            window["todo"].update(value=values["todos"][0])
+
+window.close()
+writer.close()
+show_errors()
@@ -0,0 +1,99 @@
+# Latency of one Add / Complete event on a large list: the store called on
+# the event thread versus the in-memory update plus BackgroundWriter that
+# Todos.py uses. With --window the Listbox refresh is included (needs a
+# display): a full update(values=...) for sync and background, single-row
+# LazyListbox changes for incremental.
+#
+#   python bench_gui.py --items 50000 --events 200
+#   python bench_gui.py --items 100000 --window
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import functions
+from listview import LazyListbox
+
+
+def percentiles(samples):
+    samples=sorted(samples)
+    return (statistics.median(samples)*1e3,samples[int(len(samples)*0.99)-1]*1e3)
+
+
+def run(mode,items,events,listbox):
+    with tempfile.TemporaryDirectory() as directory:
+        filepath=os.path.join(directory,"todos.txt")
+        with open(filepath,"w") as file:
+            file.writelines(f"todo number {n}\n" for n in range(items))
+        store=functions.TodoStore(filepath)
+        writer=functions.BackgroundWriter(store) if mode!="sync" else None
+        todos=store.todos
+        lazy=None
+        if listbox is not None and mode=="incremental":
+            lazy=LazyListbox(listbox,todos)
+        elif listbox is not None:
+            listbox.update(values=[todo.strip("\n") for todo in todos])
+        results={}
+        for action in ("add","complete"):
+            samples=[]
+            for n in range(events):
+                began=time.perf_counter()
+                if action=="add":
+                    todo=f"new todo {n}"
+                    if lazy:
+                        lazy.append(todo+"\n")
+                        writer.submit("add",todo)
+                    elif writer:
+                        todos.append(todo+"\n")
+                        writer.submit("add",todo)
+                    else:
+                        store.add(todo)
+                        todos=store.todos
+                else:
+                    index=len(todos)//2
+                    if lazy:
+                        writer.submit("complete",index,old=todos[index])
+                        lazy.pop(index)
+                    elif writer:
+                        writer.submit("complete",index,old=todos[index])
+                        todos.pop(index)
+                    else:
+                        store.complete(index,old=todos[index])
+                        todos=store.todos
+                if listbox is not None:
+                    if not lazy:
+                        listbox.update(values=[todo.strip("\n") for todo in todos])
+                    listbox.ParentForm.refresh()
+                samples.append(time.perf_counter()-began)
+            results[action]=percentiles(samples)
+        drained=0.0
+        if writer:
+            began=time.perf_counter()
+            writer.close()
+            drained=time.perf_counter()-began
+            assert store.todos==todos
+    print(f"{mode:>11}  add p50 {results['add'][0]:7.3f}ms p99 {results['add'][1]:7.3f}ms"
+          f"  complete p50 {results['complete'][0]:7.3f}ms p99 {results['complete'][1]:7.3f}ms"
+          f"  writer drained in {drained:.2f}s")
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--items",type=int,default=50000)
+    parser.add_argument("--events",type=int,default=200)
+    parser.add_argument("--window",action="store_true",help="include a real Listbox refresh")
+    args=parser.parse_args()
+    listbox=window=None
+    if args.window:
+        import FreeSimpleGUI as fsg
+        listbox=fsg.Listbox(values=[],size=(45,10))
+        window=fsg.Window("bench",layout=[[listbox]],finalize=True)
+    for mode in ("sync","background","incremental"):
+        run(mode,args.items,args.events,listbox)
+    if window:
+        window.close()
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,76 @@
+import tkinter as tk
+
+# Rows handed to Tk at a time; the next chunk is loaded when the list is
+# scrolled close to the last loaded row.
+CHUNK=200
+
+
+class LazyListbox:
+    # Keeps a finalized FreeSimpleGUI Listbox in step with a list of todos
+    # (store lines) by inserting and deleting single rows instead of sending
+    # the whole list to Tk with update(values=...). Only the rows scrolled
+    # into view so far are loaded into the widget. element.Values mirrors the
+    # loaded rows so window.read() still reports the right selection.
+    def __init__(self,element,todos,chunk=CHUNK):
+        self.element=element
+        self.widget=element.Widget
+        self.todos=todos
+        self.chunk=chunk
+        element.Values=[]
+        self.widget.delete(0,tk.END)
+        scrollbar=element.vsb
+
+        def scrolled(first,last):
+            if scrollbar is not None:
+                scrollbar.set(first,last)
+            if float(last)>=0.9:
+                self.load_more()
+        self.widget.configure(yscrollcommand=scrolled)
+        self.load_more()
+
+    @property
+    def loaded(self):
+        return len(self.element.Values)
+
+    def load_more(self):
+        start=self.loaded
+        rows=[todo.strip("\n") for todo in self.todos[start:start+self.chunk]]
+        if rows:
+            self.widget.insert(tk.END,*rows)
+            self.element.Values.extend(rows)
+
+    def selected(self):
+        return [int(index) for index in self.widget.curselection()]
+
+    def append(self,todo):
+        self.insert(len(self.todos),todo)
+
+    def insert(self,index,todo):
+        self.todos.insert(index,todo)
+        if index<=self.loaded and (index<self.loaded or self.loaded==len(self.todos)-1):
+            row=todo.strip("\n")
+            self.widget.insert(index,row)
+            self.element.Values.insert(index,row)
+
+    def set(self,index,todo):
+        self.todos[index]=todo
+        if index<self.loaded:
+            row=todo.strip("\n")
+            selected=self.widget.selection_includes(index)
+            self.widget.delete(index)
+            self.widget.insert(index,row)
+            self.element.Values[index]=row
+            if selected:
+                self.widget.selection_set(index)
+
+    def pop(self,index):
+        todo=self.todos.pop(index)
+        if index<self.loaded:
+            self.widget.delete(index)
+            self.element.Values.pop(index)
+            # keep as many rows loaded as before
+            if self.loaded<len(self.todos):
+                row=self.todos[self.loaded].strip("\n")
+                self.widget.insert(tk.END,row)
+                self.element.Values.append(row)
+        return todo
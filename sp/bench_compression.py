@@ -0,0 +1,49 @@
+# Renders the sample texts, each repeated --scale times, at every
+# compression level and reports input bytes/s and output size.
+#
+#   python bench_compression.py --scale 10000
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import compression
+import main as pipeline
+
+
+def seed(directory,scale):
+    filepaths=[]
+    for sample in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)),"*.txt"))):
+        with open(sample) as file:
+            text=file.read()
+        filepath=os.path.join(directory,os.path.basename(sample))
+        with open(filepath,"w") as file:
+            for _ in range(scale):
+                file.write(text)
+        filepaths.append(filepath)
+    return filepaths
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--scale",type=int,default=10000)
+    parser.add_argument("--fpdf",action="store_true",help="render through FPDF instead of the streaming writer")
+    args=parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        filepaths=seed(directory,args.scale)
+        size=sum(os.path.getsize(filepath) for filepath in filepaths)
+        output=os.path.join(directory,"out.pdf")
+        print(f"{'level':>8} {'input':>12} {'time':>9} {'bytes/s':>12} {'output':>12}")
+        for name,level in compression.LEVELS.items():
+            began=time.perf_counter()
+            if args.fpdf:
+                pipeline.render(filepaths,output,level=level)
+            else:
+                pipeline.render_stream(filepaths,output,level=level)
+            elapsed=time.perf_counter()-began
+            print(f"{name:>8} {size:>12} {elapsed:>8.2f}s {size/elapsed:>12.0f} {os.path.getsize(output):>12}")
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,50 @@
+# Builds a directory tree of --files text files and compares discover()
+# with glob.glob(recursive=True) on a set of patterns, relative and
+# absolute, with "**" in the middle and at the end: both must find the same
+# files, and the times of both are reported.
+#
+#   python bench_discover.py --files 20000
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import discover
+
+PATTERNS=["*.txt","*/*.txt","**/*.txt","**","d0/**","d0/**/*.txt","d*/s1/*.txt","d1/s1/f1.txt"]
+
+
+def seed(directory,files):
+    for number in range(files):
+        path=os.path.join(directory,f"d{number%10}",f"s{number%7}")
+        os.makedirs(path,exist_ok=True)
+        open(os.path.join(path,f"f{number}.txt"),"w").close()
+    for name in ("top.txt",".hidden.txt",os.path.join("d0",".cache","skip.txt")):
+        os.makedirs(os.path.dirname(os.path.join(directory,name)),exist_ok=True)
+        open(os.path.join(directory,name),"w").close()
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--files",type=int,default=20000)
+    args=parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        seed(directory,args.files)
+        os.chdir(directory)
+        patterns=PATTERNS+[os.path.join(directory,pattern) for pattern in PATTERNS]
+        print(f"{'pattern':<{max(map(len,patterns))}} {'files':>7} {'glob':>8} {'discover':>9}")
+        for pattern in patterns:
+            began=time.perf_counter()
+            expected=sorted(path for path in glob.glob(pattern,recursive=True) if os.path.isfile(path))
+            globbed=time.perf_counter()-began
+            began=time.perf_counter()
+            found=sorted(discover.discover(pattern))
+            discovered=time.perf_counter()-began
+            if found!=expected:
+                raise SystemExit(f"{pattern}: discover found {len(found)} files, glob {len(expected)}")
+            print(f"{pattern:<{max(map(len,patterns))}} {len(found):>7} {globbed:>7.3f}s {discovered:>8.3f}s")
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,72 @@
+# Times multi_cell on the sample texts with the stock FPDF and with
+# layout.FastFPDF, and checks both wrote the same page content. Also checks
+# that pdfstream.LineBreaker, fed the way --stream and --mmap read files,
+# breaks the same lines, with a word longer than a read chunk added.
+#
+#   python bench_layout.py --repeat 200
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+from fpdf import FPDF
+
+import layout
+import pdfstream
+
+# a base64 blob or minified JSON without spaces, cut by every read
+LONG_WORD="QUJD"*(pdfstream.CHUNK_SIZE*3//8)
+
+
+def run(cls,texts,repeat):
+    pdf=cls(orientation='P',unit='mm',format='A4')
+    pdf.add_page()
+    pdf.set_font("Arial",size=12)
+    began=time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            pdf.multi_cell(w=0,h=6,txt=text)
+    return time.perf_counter()-began,pdf.pages
+
+
+def same_lines(texts):
+    # LineBreaker against Layout.lines for every text, read both ways
+    pdf=FPDF(orientation='P',unit='mm',format='A4')
+    pdf.add_page()
+    pdf.set_font("Arial",size=12)
+    lines=layout.get_layout(pdf.current_font)
+    wmax=(pdf.w-pdf.l_margin-pdf.r_margin-2*pdf.c_margin)*1000/pdf.font_size
+    with tempfile.TemporaryDirectory() as directory:
+        filepath=os.path.join(directory,"text.txt")
+        for text in texts:
+            with open(filepath,"w") as file:
+                file.write(text)
+            for read in (pdfstream.read_chunks,pdfstream.read_mapped):
+                breaker=pdfstream.LineBreaker(lines,wmax)
+                found=[line for chunk in read(filepath) for line in breaker.feed(chunk)]+breaker.finish()
+                if found!=lines.lines(text,wmax):
+                    return False
+    return True
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--repeat",type=int,default=200)
+    args=parser.parse_args()
+    texts=[]
+    for filepath in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)),"*.txt"))):
+        with open(filepath) as file:
+            texts.append(file.read())
+    characters=sum(map(len,texts))*args.repeat
+    stock,stock_pages=run(FPDF,texts,args.repeat)
+    fast,fast_pages=run(layout.FastFPDF,texts,args.repeat)
+    print(f"{'path':>8} {'chars':>10} {'time':>9} {'chars/s':>12}")
+    print(f"{'stock':>8} {characters:>10} {stock:>8.3f}s {characters/stock:>12.0f}")
+    print(f"{'layout':>8} {characters:>10} {fast:>8.3f}s {characters/fast:>12.0f}")
+    print(f"speedup {stock/fast:.1f}x, same output: {stock_pages==fast_pages}")
+    print(f"streamed lines the same: {same_lines(texts+[LONG_WORD,'start '+LONG_WORD+' end'])}")
+
+
+if __name__=="__main__":
+    main()
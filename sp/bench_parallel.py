@@ -0,0 +1,51 @@
+# Renders the sample texts copied out to many files, once serially into one
+# FPDF and once through the process pool plus merge, and reports the speedup.
+#
+#   python bench_parallel.py --files 1000 --jobs 8
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+import main as pipeline
+
+
+def seed(directory,files):
+    samples=sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)),"*.txt")))
+    filepaths=[]
+    for number in range(files):
+        filepath=os.path.join(directory,f"input{number:06d}.txt")
+        shutil.copyfile(samples[number%len(samples)],filepath)
+        filepaths.append(filepath)
+    return filepaths
+
+
+def timed(action):
+    began=time.perf_counter()
+    action()
+    return time.perf_counter()-began
+
+
+def main():
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--files",type=int,default=1000)
+    parser.add_argument("--jobs",type=int,default=os.cpu_count())
+    parser.add_argument("--stream",action="store_true")
+    args=parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        filepaths=seed(directory,args.files)
+        output=os.path.join(directory,"out.pdf")
+        serial=timed(lambda: (pipeline.render_stream if args.stream else pipeline.render)(filepaths,output))
+        serial_size=os.path.getsize(output)
+        parallel=timed(lambda: pipeline.render_parallel(filepaths,output,args.jobs,pipeline.render_options(args.stream)))
+        parallel_size=os.path.getsize(output)
+    print(f"{'mode':>10} {'files':>7} {'jobs':>5} {'time':>9} {'bytes':>10}")
+    print(f"{'serial':>10} {args.files:>7} {1:>5} {serial:>8.2f}s {serial_size:>10}")
+    print(f"{'parallel':>10} {args.files:>7} {args.jobs:>5} {parallel:>8.2f}s {parallel_size:>10}")
+    print(f"speedup {serial/parallel:.2f}x")
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import pdfmerge
+
+# Incremental builds: every input's fragment is kept in the cache directory
+# under a hash of what went into it, and the manifest remembers each input's
+# size, mtime and hash plus where its pages ended up in the output. Inputs
+# whose size and mtime did not change are not even read again.
+
+CACHE_DIR=".sp-cache"
+MANIFEST="manifest.json"
+
+
+def file_hash(filepath):
+    digest=hashlib.sha1()
+    with open(filepath,"rb") as file:
+        for block in iter(lambda: file.read(1<<20),b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stat(filepath):
+    stat=os.stat(filepath)
+    return [stat.st_size,stat.st_mtime_ns]
+
+
+def load_manifest(cache):
+    try:
+        with open(os.path.join(cache,MANIFEST)) as file:
+            return json.load(file)
+    except (OSError,ValueError):
+        return {"inputs":{},"fragments":[],"output":None}
+
+
+def save_manifest(cache,manifest):
+    handle,temporary=tempfile.mkstemp(dir=cache)
+    with os.fdopen(handle,"w") as file:
+        json.dump(manifest,file)
+    os.replace(temporary,os.path.join(cache,MANIFEST))
+
+
+def build(filepaths,output,render_fragments,mode="fpdf",cache=CACHE_DIR):
+    # render_fragments gets a list of (input, fragment) pairs to render.
+    # Returns how many inputs had to be rendered.
+    os.makedirs(cache,exist_ok=True)
+    manifest=load_manifest(cache)
+    known=manifest["inputs"]
+    inputs={}
+    fragments=[]
+    tasks=[]
+    pending=set()
+    for filepath in filepaths:
+        stat=_stat(filepath)
+        entry=known.get(filepath)
+        if entry and entry["stat"]==stat:
+            content=entry["hash"]
+        else:
+            content=file_hash(filepath)
+        # the title comes from the file name, so it is part of the key too
+        key=hashlib.sha1(f"{mode}\0{os.path.basename(filepath)}\0{content}".encode()).hexdigest()
+        fragment=os.path.join(cache,key+".pdf")
+        if fragment not in pending and not os.path.exists(fragment):
+            tasks.append((filepath,fragment))
+            pending.add(fragment)
+        inputs[filepath]={"stat":stat,"hash":content,"fragment":key}
+        if entry and entry["fragment"]==key and "pages" in entry:
+            inputs[filepath]["pages"]=entry["pages"]
+        fragments.append(fragment)
+    if tasks:
+        render_fragments(tasks)
+    keys=[inputs[filepath]["fragment"] for filepath in filepaths]
+    if (not tasks and keys==manifest["fragments"] and os.path.exists(output)
+            and _stat(output)==manifest["output"]):
+        if inputs!=known:
+            manifest["inputs"]=inputs
+            save_manifest(cache,manifest)
+        return 0
+    counts=pdfmerge.merge(fragments,output)
+    first=1
+    for filepath,count in zip(filepaths,counts):
+        inputs[filepath]["pages"]=[first,first+count-1]
+        first+=count
+    used=set(keys)
+    for name in os.listdir(cache):
+        if name.endswith(".pdf") and name[:-4] not in used:
+            os.remove(os.path.join(cache,name))
+    save_manifest(cache,{"inputs":inputs,"fragments":keys,"output":_stat(output)})
+    return len(tasks)
@@ -0,0 +1,152 @@
+import os
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from fpdf import FPDF
+from fpdf.fpdf import UTF8ToUTF16BE, sprintf
+
+# How hard page content streams are deflated. zlib lets go of the GIL while
+# it works, so compressing in a thread pool overlaps with laying out the
+# next pages.
+
+LEVELS={"none":0,"fast":1,"default":6,"max":9}
+
+# how many finished streams may wait for compression before layout waits
+BACKLOG=64
+
+
+class Compressor:
+    # Compresses streams in worker threads and hands them back in the order
+    # they were submitted.
+    def __init__(self,level,workers=None):
+        self.level=level
+        self.own_pool=ThreadPoolExecutor(workers) if workers else None
+        self.pool=self.own_pool or shared_pool()
+        self.pending=deque()
+
+    def submit(self,data,*context):
+        self.pending.append((self.pool.submit(zlib.compress,data,self.level),context))
+
+    def put(self,data,*context):
+        # queues data that needs no compressing, to keep it in order
+        future=Future()
+        future.set_result(data)
+        self.pending.append((future,context))
+
+    def ready(self,wait=False):
+        # (compressed, *context) for every stream that is done, oldest
+        # first; waits for all of them with wait, and for the oldest ones
+        # when too many are queued
+        pending=self.pending
+        while pending and (wait or pending[0][0].done() or len(pending)>BACKLOG):
+            future,context=pending.popleft()
+            yield (future.result(),*context)
+
+    def close(self):
+        if self.own_pool:
+            self.own_pool.shutdown()
+
+
+_pool=None
+_pool_lock=threading.Lock()
+
+
+def shared_pool():
+    # One compression pool per process, however many documents it writes.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool=ThreadPoolExecutor(os.cpu_count())
+        return _pool
+
+
+class CompressedFPDF(FPDF):
+    # FPDF with a compression level. From the second page on, every page is
+    # compressed on the shared pool as soon as it is finished, and output()
+    # only collects the results; a one-page document is compressed inline
+    # and never touches the pool.
+    compression=LEVELS["default"]
+
+    def set_compression_level(self,level):
+        self.compression=level
+        self.set_compression(level>0)
+
+    def _endpage(self):
+        super()._endpage()
+        if not self.compress or self.page<2:
+            return
+        if not hasattr(self,"_streams"):
+            self._streams={}
+        # pages up to _submitted are on the pool already; only page 1 waits
+        # for the next one
+        for number in range(getattr(self,"_submitted",0)+1,self.page+1):
+            text=self.pages[number]
+            self._streams[number]=(text,shared_pool().submit(zlib.compress,text.encode("latin1"),self.compression))
+        self._submitted=self.page
+
+    def _compressed(self,number):
+        text,future=getattr(self,"_streams",{}).pop(number,(None,None))
+        if future is not None and text==self.pages[number]:
+            return future.result()
+        # not submitted, or changed since the page ended ({nb} aliases)
+        return zlib.compress(self.pages[number].encode("latin1"),self.compression)
+
+    def _putpages(self):
+        # FPDF._putpages, with each page's content stream taken from
+        # _compressed instead of compressed here
+        nb=self.page
+        if hasattr(self,"str_alias_nb_pages"):
+            alias=UTF8ToUTF16BE(self.str_alias_nb_pages,False)
+            r=UTF8ToUTF16BE(str(nb),False)
+            for n in range(1,nb+1):
+                self.pages[n]=self.pages[n].replace(alias,r)
+            for n in range(1,nb+1):
+                self.pages[n]=self.pages[n].replace(self.str_alias_nb_pages,str(nb))
+        if self.def_orientation=="P":
+            w_pt=self.fw_pt
+            h_pt=self.fh_pt
+        else:
+            w_pt=self.fh_pt
+            h_pt=self.fw_pt
+        filter="/Filter /FlateDecode " if self.compress else ""
+        for n in range(1,nb+1):
+            self._newobj()
+            self._out("<</Type /Page")
+            self._out("/Parent 1 0 R")
+            if n in self.orientation_changes:
+                self._out(sprintf("/MediaBox [0 0 %.2f %.2f]",h_pt,w_pt))
+            self._out("/Resources 2 0 R")
+            if self.page_links and n in self.page_links:
+                annots="/Annots ["
+                for pl in self.page_links[n]:
+                    rect=sprintf("%.2f %.2f %.2f %.2f",pl[0],pl[1],pl[0]+pl[2],pl[1]-pl[3])
+                    annots+="<</Type /Annot /Subtype /Link /Rect ["+rect+"] /Border [0 0 0] "
+                    if isinstance(pl[4],str):
+                        annots+="/A <</S /URI /URI "+self._textstring(pl[4])+">>>>"
+                    else:
+                        l=self.links[pl[4]]
+                        h=w_pt if l[0] in self.orientation_changes else h_pt
+                        annots+=sprintf("/Dest [%d 0 R /XYZ 0 %.2f null]>>",1+2*l[0],h-l[1]*self.k)
+                self._out(annots+"]")
+            if self.pdf_version>"1.3":
+                self._out("/Group <</Type /Group /S /Transparency /CS /DeviceRGB>>")
+            self._out("/Contents "+str(self.n+1)+" 0 R>>")
+            self._out("endobj")
+            p=self._compressed(n) if self.compress else self.pages[n]
+            self._newobj()
+            self._out("<<"+filter+"/Length "+str(len(p))+">>")
+            self._putstream(p)
+            self._out("endobj")
+        self.offsets[1]=len(self.buffer)
+        self._out("1 0 obj")
+        self._out("<</Type /Pages")
+        kids="/Kids ["
+        for i in range(0,nb):
+            kids+=str(3+2*i)+" 0 R "
+        self._out(kids+"]")
+        self._out("/Count "+str(nb))
+        self._out(sprintf("/MediaBox [0 0 %.2f %.2f]",w_pt,h_pt))
+        self._out(">>")
+        self._out("endobj")
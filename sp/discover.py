@@ -0,0 +1,86 @@
+import os
+import zlib
+from fnmatch import fnmatchcase
+
+# Finds input files the way glob.glob does, but as a generator over
+# os.scandir, in a stable order (by name, directory by directory) and
+# optionally restricted to one shard of the matches. "**" matches any
+# number of directories, and like glob a leading "*" does not match
+# hidden names.
+
+
+def _split(pattern):
+    # "docs/2023/**/*.txt" -> ("docs/2023", ["**", "*.txt"])
+    drive,pattern=os.path.splitdrive(pattern)
+    parts=pattern.replace(os.sep,"/").split("/")
+    # an absolute pattern keeps its anchor ("/" or "C:\\")
+    anchor=drive
+    if len(parts)>1 and parts[0]=="":
+        anchor+=os.sep
+        parts.pop(0)
+    root=[]
+    while len(parts)>1 and not any(char in parts[0] for char in "*?["):
+        root.append(parts.pop(0))
+    return os.path.join(anchor,*root) if anchor or root else "",parts
+
+
+def _name_matches(name,part):
+    if name.startswith(".") and not part.startswith("."):
+        return False
+    return fnmatchcase(name,part)
+
+
+def _matches(names,parts):
+    # names is the path below the root split into its parts
+    if not parts:
+        return not names
+    if parts[0]=="**":
+        return any(_matches(names[skip:],parts[1:]) for skip in range(len(names)+1)
+                   if not any(name.startswith(".") for name in names[:skip]))
+    return bool(names) and _name_matches(names[0],parts[0]) and _matches(names[1:],parts[1:])
+
+
+def _may_contain(names,parts):
+    # could anything below this directory still match?
+    for depth,name in enumerate(names):
+        # checked first, so a trailing "**" still descends
+        if depth<len(parts) and parts[depth]=="**":
+            return not name.startswith(".")
+        if depth>=len(parts)-1:
+            return False
+        if not _name_matches(name,parts[depth]):
+            return False
+    return True
+
+
+def discover(pattern,shard=None):
+    # shard is (index, count): only paths whose hash falls into shard index
+    # of count are yielded, so every path lands in exactly one shard and
+    # stays there when other files come and go.
+    root,parts=_split(pattern)
+    stack=[(root,[])]
+    while stack:
+        directory,names=stack.pop()
+        try:
+            with os.scandir(directory or ".") as entries:
+                found=sorted((entry.name,entry.is_dir()) for entry in entries)
+        except OSError:
+            continue
+        subdirectories=[]
+        for name,is_dir in found:
+            below=names+[name]
+            if is_dir and _may_contain(below,parts):
+                subdirectories.append((os.path.join(directory,name),below))
+            if not is_dir and _matches(below,parts):
+                path=os.path.join(directory,name)
+                if shard is None or zlib.crc32(path.encode())%shard[1]==shard[0]:
+                    yield path
+        stack.extend(reversed(subdirectories))
+
+
+def parse_shard(text):
+    # "2/8" -> (2, 8), shards are numbered from 0
+    index,count=(int(number) for number in text.split("/"))
+    if not 0<=index<count:
+        raise ValueError(f"shard {text} is not in 0/{count}..{count-1}/{count}")
+    return index,count
@@ -0,0 +1,123 @@
+from bisect import bisect_right
+from itertools import accumulate
+
+from compression import CompressedFPDF
+from reproducible import ReproducibleFPDF
+
+# Line breaking for multi_cell without measuring text a character at a time.
+# Every font gets a 256 entry width table and a cache of word widths, and a
+# paragraph is broken by bisecting the running width of its words instead of
+# walking its characters. Widths are in 1/1000 of the font size, like FPDF's
+# own, so the lines come out exactly as FPDF.multi_cell breaks them.
+
+_layouts={}
+
+
+class Layout:
+    def __init__(self,cw):
+        self.cw=cw
+        self.table=[cw.get(chr(code),0) for code in range(256)]
+        self.space=self.table[32]
+        self.words={}
+
+    def width(self,word):
+        width=self.words.get(word)
+        if width is None:
+            try:
+                width=sum([self.table[code] for code in word.encode("latin-1")])
+            except UnicodeEncodeError:
+                width=sum([self.cw.get(char,0) for char in word])
+            self.words[word]=width
+        return width
+
+    def lines(self,text,wmax):
+        # (text, width, spaces, wrapped) for every line multi_cell would
+        # write; wrapped lines were broken at a space and get justified.
+        text=text.replace("\r","")
+        if text.endswith("\n"):
+            text=text[:-1]
+        lines=[]
+        for paragraph in text.split("\n"):
+            self._paragraph(paragraph.split(" "),wmax,lines)
+        return lines
+
+    def _paragraph(self,words,wmax,lines):
+        width=self.width
+        space=self.space
+        widths=[width(word) for word in words]
+        # ends[k] is the width of words[:k] with a space after each of them
+        ends=[0,*accumulate([word+space for word in widths])]
+        start=0
+        head=widths[0]
+        count=len(words)
+        while True:
+            first=words[start]
+            while head>wmax:
+                # a word wider than the line is cut wherever it overflows
+                used=0
+                for cut,char in enumerate(first):
+                    used+=width(char)
+                    if used>wmax:
+                        break
+                cut=max(cut,1)
+                lines.append((first[:cut],width(first[:cut]),0,False))
+                first=first[cut:]
+                head=width(first)
+            # the line takes every following word while it still fits
+            end=bisect_right(ends,wmax-head+ends[start+1],start+1)-1
+            end=max(end,start+1)
+            line=" ".join([first,*words[start+1:end]])
+            line_width=head+ends[end]-ends[start+1]
+            if end>=count:
+                lines.append((line,line_width,end-start-1,False))
+                return
+            lines.append((line,line_width,end-start-1,True))
+            start=end
+            head=widths[start]
+
+
+def get_layout(font):
+    # One Layout per font and process, so the word cache outlives documents.
+    layout=_layouts.get(font["name"])
+    if layout is None:
+        layout=_layouts[font["name"]]=Layout(font["cw"])
+    return layout
+
+
+class FastFPDF(ReproducibleFPDF,CompressedFPDF):
+    # FPDF with multi_cell running on Layout. The cells and Tw operators
+    # written are the same as FPDF's; TTF fonts use the stock code.
+    def multi_cell(self,w,h,txt='',border=0,align='J',fill=0,split_only=False):
+        if self.unifontsubset:
+            return super().multi_cell(w,h,txt,border,align,fill,split_only)
+        txt=self.normalize_text(txt)
+        if w==0:
+            w=self.w-self.r_margin-self.x
+        wmax=(w-2*self.c_margin)*1000.0/self.font_size
+        lines=get_layout(self.current_font).lines(txt,wmax)
+        if split_only:
+            return [line[0] for line in lines]
+        b=0
+        b2=''
+        if border:
+            if border==1:
+                border='LTRB'
+                b='LRT'
+                b2='LR'
+            else:
+                b2=''.join(side for side in 'LR' if side in border)
+                b=b2+'T' if 'T' in border else b2
+        last=len(lines)-1
+        for number,(line,width,spaces,wrapped) in enumerate(lines):
+            if wrapped and align=='J':
+                self.ws=(wmax-width)/1000.0*self.font_size/spaces if spaces else 0
+                self._out('%.3f Tw' % (self.ws*self.k))
+            elif self.ws>0:
+                self.ws=0
+                self._out('0 Tw')
+            if number==last and border and 'B' in border:
+                b+='B'
+            self.cell(w,h,line,b,2,align,fill)
+            if border and number==0:
+                b=b2
+        self.x=self.l_margin
@@ -1,21 +1,141 @@
-import pandas as pd
-import glob
-from fpdf import FPDF
+import argparse
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-filepath=glob.glob("*.txt")
-pdf = FPDF(orientation='P', unit='mm', format='A4')
-
-for i in filepath:
-    filename = Path(i).stem
-    name=filename.title()
-    pdf.add_page()
-    pdf.set_font("Arial", size=16, style="B")
-    pdf.cell(w=50, h=8, txt=f"{name}", ln=1)
-    with open(i, "r") as file:
-        content=file.read()
-    pdf.set_font("Arial", size=12)
-    pdf.multi_cell(w=0, h=6, txt=content)
-  
-
-pdf.output("Multiple_pdf.pdf")
+import build
+import compression
+import discover
+import layout
+import pdfmerge
+import pdfstream
+import reproducible
 
+
+def render(filepaths,output,reproducible=False,level=compression.LEVELS["default"]):
+    pdf = layout.FastFPDF(orientation='P', unit='mm', format='A4')
+    pdf.reproducible=reproducible
+    pdf.set_compression_level(level)
+    for i in filepaths:
+        filename = Path(i).stem
+        name=filename.title()
+        pdf.add_page()
+        pdf.set_font("Arial", size=16, style="B")
+        pdf.cell(w=50, h=8, txt=f"{name}", ln=1)
+        with open(i, "r") as file:
+            content=file.read()
+        pdf.set_font("Arial", size=12)
+        pdf.multi_cell(w=0, h=6, txt=content)
+    pdf.output(output)
+
+
+def render_stream(filepaths,output,font=None,level=compression.LEVELS["default"],mapped=False,bold_font=None):
+    # Same layout as render(), but inputs are read in chunks and every page
+    # goes to disk as soon as it is full. With a TrueType font file any
+    # Unicode text can be written, not just latin-1; titles use bold_font,
+    # or the same font when there is none. mapped reads inputs through mmap
+    # instead of file reads.
+    pdf=pdfstream.StreamingPDF(output,level)
+    family="Arial"
+    if font:
+        family="text"
+        pdf.add_font(family,font)
+        pdf.add_font(family,bold_font or font,"B")
+    for i in filepaths:
+        name=Path(i).stem.title()
+        pdf.add_page()
+        pdf.set_font(family,16,"B")
+        pdf.cell(name,8)
+        pdf.set_font(family,12)
+        pdf.multi_cell((pdfstream.read_mapped if mapped else pdfstream.read_chunks)(i),6)
+    pdf.close()
+
+
+def render_fragment(task):
+    filepath,fragment,options=task
+    # written under another name first, so a cache never holds half a file
+    if options["stream"]:
+        render_stream([filepath],fragment+".part",options["font"],options["level"],options["mapped"],
+                      options["bold_font"])
+    else:
+        render([filepath],fragment+".part",level=options["level"])
+    os.replace(fragment+".part",fragment)
+    return fragment
+
+
+def load_font(*fonts):
+    # pool initializer: parse the fonts once per worker, not once per file
+    for font in fonts:
+        if font:
+            import ttf
+            ttf.load(font)
+
+
+def render_options(stream=False,font=None,level=compression.LEVELS["default"],mapped=False,bold_font=None):
+    # how render_fragment renders every file
+    return {"stream":stream or bool(font) or mapped,"font":font,"level":level,"mapped":mapped,
+            "bold_font":bold_font if font else None}
+
+
+def render_fragments(tasks,jobs=None,options=None):
+    # Renders (input, fragment) pairs, in worker processes if jobs is set.
+    options=options or render_options()
+    tasks=[(filepath,fragment,options) for filepath,fragment in tasks]
+    if not jobs:
+        return [render_fragment(task) for task in tasks]
+    with ProcessPoolExecutor(jobs,initializer=load_font,
+                             initargs=(options["font"],options["bold_font"])) as pool:
+        return list(pool.map(render_fragment,tasks,chunksize=max(1,len(tasks)//(jobs*4))))
+
+
+def render_parallel(filepaths,output,jobs,options=None):
+    # Every input becomes its own one-file PDF in a worker process, then the
+    # fragments are merged in input order.
+    with tempfile.TemporaryDirectory() as directory:
+        tasks=[(filepath,os.path.join(directory,f"{number}.pdf"))
+               for number,filepath in enumerate(filepaths)]
+        pdfmerge.merge(render_fragments(tasks,jobs,options),output)
+
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description="Put every text file into one PDF.")
+    parser.add_argument("pattern",nargs="?",default="*.txt",help='files to include, "**" matches any directories')
+    parser.add_argument("--shard",type=discover.parse_shard,default=None,metavar="I/N",
+                        help="only take shard I (0 to N-1) of the matching files")
+    parser.add_argument("-o","--output",default="Multiple_pdf.pdf")
+    parser.add_argument("--stream",action="store_true",
+                        help="read inputs in chunks and write pages as they fill up, for very large files")
+    parser.add_argument("--font",default=None,metavar="TTF",
+                        help="write the text in this TrueType font, for text that is not latin-1 (implies --stream)")
+    parser.add_argument("--bold-font",default=None,metavar="TTF",
+                        help="TrueType font for the titles with --font; without it titles use --font")
+    parser.add_argument("--mmap",action="store_true",
+                        help="map inputs into memory instead of reading them, for multi-GB files (implies --stream)")
+    parser.add_argument("-c","--compression",choices=compression.LEVELS,default="default",
+                        help="how hard to compress page content: none, fast (zlib 1), default (6) or max (9)")
+    parser.add_argument("-j","--jobs",type=int,default=None,
+                        help="render files in this many processes and merge the results (0: one per core)")
+    parser.add_argument("-r","--reproducible",action="store_true",
+                        help="write the same bytes for the same inputs and a .sha256 file next to the output")
+    parser.add_argument("-i","--incremental",action="store_true",
+                        help=f"only re-render inputs that changed since the last run (cache in {build.CACHE_DIR})")
+    args=parser.parse_args()
+    options=render_options(args.stream,args.font,compression.LEVELS[args.compression],args.mmap,args.bold_font)
+    filepath=discover.discover(args.pattern,args.shard)
+    jobs=args.jobs or os.cpu_count() if args.jobs is not None else None
+    if args.incremental:
+        filepath=list(filepath)
+        mode=f"fpdf:{options['level']}"
+        if options["stream"]:
+            fonts=":".join(os.path.abspath(font) if font else "" for font in (args.font,options["bold_font"]))
+            mode=f"stream:{fonts}:{options['level']}"
+        rendered=build.build(filepath,args.output,lambda tasks: render_fragments(tasks,jobs,options),mode)
+        print(f"{rendered} of {len(filepath)} files rendered")
+    elif args.jobs is not None:
+        render_parallel(filepath,args.output,jobs,options)
+    elif options["stream"]:
+        render_stream(filepath,args.output,args.font,options["level"],args.mmap,options["bold_font"])
+    else:
+        render(filepath,args.output,args.reproducible,options["level"])
+    if args.reproducible:
+        reproducible.write_digest(args.output)
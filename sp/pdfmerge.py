@@ -0,0 +1,138 @@
+import hashlib
+import re
+
+import reproducible
+
+# Joins the single-file PDFs written by FPDF or pdfstream into one document
+# without laying anything out again. Objects are copied with their numbers
+# rewritten, identical objects (fonts, resource dictionaries) are written
+# once, and every page is hung under one new page tree.
+
+REFERENCE=re.compile(rb"(\d+) 0 R")
+PARENT=re.compile(rb"/Parent \d+ 0 R")
+LENGTH=re.compile(rb"/Length (\d+)")
+
+
+class Fragment:
+    def __init__(self,filepath):
+        with open(filepath,"rb") as file:
+            self.data=file.read()
+        self.offsets=self._xref()
+        trailer=self.data[self.data.rindex(b"trailer"):]
+        root=int(re.search(rb"/Root (\d+) 0 R",trailer).group(1))
+        pages=self.head(int(re.search(rb"/Pages (\d+) 0 R",self.head(root)).group(1)))
+        self.pages=[int(number) for number in REFERENCE.findall(re.search(rb"/Kids \[(.*?)\]",pages,re.S).group(1))]
+        # FPDF puts the page size on the page tree, where the merged pages
+        # can no longer inherit it from
+        media_box=re.search(rb"/MediaBox \[[^\]]*\]",pages)
+        self.media_box=media_box.group(0) if media_box else None
+
+    def _xref(self):
+        data=self.data
+        start=int(data[data.rindex(b"startxref")+9:].split()[0])
+        lines=data[start:data.index(b"trailer",start)].split(b"\n")
+        offsets={}
+        number=0
+        for line in lines[1:]:
+            fields=line.split()
+            if len(fields)==2:
+                number=int(fields[0])
+            elif len(fields)==3:
+                if fields[2]==b"n":
+                    offsets[number]=int(fields[0])
+                number+=1
+        return offsets
+
+    def body(self,number):
+        # everything between "n 0 obj" and "endobj"
+        data=self.data
+        start=data.index(b"obj",self.offsets[number])+3
+        stream=data.find(b"stream",start)
+        end=data.index(b"endobj",start)
+        if stream<0 or stream>end:
+            return data[start:end].strip()
+        length=int(LENGTH.search(data,start,stream).group(1))
+        end=data.index(b"endobj",stream+7+length)
+        return data[start:end].strip()
+
+    def head(self,number):
+        # the dictionary part of an object, the only part holding references
+        body=self.body(number)
+        stream=body.find(b"stream")
+        return body if stream<0 else body[:stream]
+
+
+class Merger:
+    def __init__(self,filepath):
+        self.file=open(filepath,"wb")
+        self.position=0
+        self.digest=hashlib.md5()
+        self.offsets={}
+        self.kids=[]
+        self.seen={}
+        # 1 is the page tree, written last once every page is known
+        self.objects=1
+        self._write(b"%PDF-1.3\n")
+
+    def _write(self,data):
+        self.file.write(data)
+        self.digest.update(data)
+        self.position+=len(data)
+
+    def _object(self,number,body):
+        self.offsets[number]=self.position
+        self._write(b"%d 0 obj\n" % number+body+b"\nendobj\n")
+
+    def _new_object(self):
+        self.objects+=1
+        return self.objects
+
+    def add(self,filepath):
+        # Appends every page of one fragment, returns how many there were.
+        fragment=Fragment(filepath)
+        numbers={}
+        for page in fragment.pages:
+            self.kids.append(self._copy(fragment,page,numbers,True))
+        return len(fragment.pages)
+
+    def _copy(self,fragment,number,numbers,page=False):
+        body=fragment.body(number)
+        split=body.find(b"stream")
+        head,tail=(body,b"") if split<0 else (body[:split],body[split:])
+        if page:
+            # the old parent is left out, pages are re-parented to object 1
+            head=PARENT.sub(b"/Parent PARENT",head)
+            if b"/MediaBox" not in head and fragment.media_box:
+                head=head.replace(b"/Type /Page",b"/Type /Page\n"+fragment.media_box,1)
+        for ref in REFERENCE.findall(head):
+            if int(ref) not in numbers:
+                numbers[int(ref)]=self._copy(fragment,int(ref),numbers)
+        body=REFERENCE.sub(lambda match: b"%d 0 R" % numbers[int(match.group(1))],head)+tail
+        if page:
+            new=self._new_object()
+            self._object(new,body.replace(b"/Parent PARENT",b"/Parent 1 0 R"))
+            return new
+        key=hashlib.sha1(body).digest()
+        if key not in self.seen:
+            self.seen[key]=self._new_object()
+            self._object(self.seen[key],body)
+        return self.seen[key]
+
+    def close(self):
+        kids=b" ".join(b"%d 0 R" % kid for kid in self.kids)
+        self._object(1,b"<</Type /Pages\n/Kids [%s]\n/Count %d\n>>" % (kids,len(self.kids)))
+        catalog=self._new_object()
+        self._object(catalog,b"<</Type /Catalog\n/Pages 1 0 R>>")
+        xref=self.position
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % (self.objects+1))
+        self._write(b"".join(b"%010d 00000 n \n" % self.offsets[number] for number in range(1,self.objects+1)))
+        self._write(b"trailer\n<<\n/Size %d\n/Root %d 0 R\n%s\n>>\nstartxref\n%d\n%%%%EOF\n" % (
+            self.objects+1,catalog,reproducible.document_id(self.digest.hexdigest()).encode(),xref))
+        self.file.close()
+
+
+def merge(fragments,output):
+    merger=Merger(output)
+    counts=[merger.add(fragment) for fragment in fragments]
+    merger.close()
+    return counts
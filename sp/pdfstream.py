@@ -0,0 +1,346 @@
+import codecs
+import hashlib
+import locale
+import mmap
+import os
+
+from fpdf.fonts import fpdf_charwidths
+
+import compression
+import layout
+import reproducible
+
+# Page geometry in points, matching FPDF(orientation='P', unit='mm', format='A4')
+# with its default 1cm margins and 2cm auto page break.
+PAGE_WIDTH=595.28
+PAGE_HEIGHT=841.89
+MARGIN=28.35
+CELL_MARGIN=MARGIN/10
+PAGE_BREAK=PAGE_HEIGHT-2*MARGIN
+MM=72/25.4
+
+# How much text is read from an input at a time.
+CHUNK_SIZE=1<<16
+
+CORE_FONTS={"arial":"helvetica","helvetica":"helvetica","times":"times","courier":"courier"}
+BASE_FONTS={"helvetica":"Helvetica","helveticaB":"Helvetica-Bold","helveticaI":"Helvetica-Oblique",
+            "helveticaBI":"Helvetica-BoldOblique","times":"Times-Roman","timesB":"Times-Bold",
+            "timesI":"Times-Italic","timesBI":"Times-BoldItalic","courier":"Courier",
+            "courierB":"Courier-Bold","courierI":"Courier-Oblique","courierBI":"Courier-BoldOblique"}
+
+
+def read_chunks(filepath,size=CHUNK_SIZE):
+    with open(filepath,"r") as file:
+        while True:
+            chunk=file.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def read_mapped(filepath,size=CHUNK_SIZE):
+    # Like read_chunks, but the file is mapped instead of read. Each piece
+    # is cut at the last line break within size bytes, so pieces end on
+    # whole paragraphs and only one piece at a time is copied out and
+    # decoded. Pages already consumed are dropped from the mapping again.
+    with open(filepath,"rb") as file:
+        length=os.fstat(file.fileno()).st_size
+        if not length:
+            return
+        with mmap.mmap(file.fileno(),0,access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped,"madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            decoder=codecs.getincrementaldecoder(locale.getpreferredencoding(False))()
+            start=0
+            while start<length:
+                end=min(start+size,length)
+                if end<length:
+                    cut=mapped.rfind(b"\n",start,end)
+                    if cut>=0:
+                        end=cut+1
+                yield decoder.decode(mapped[start:end],end==length)
+                done=start-start%mmap.PAGESIZE
+                consumed=end-end%mmap.PAGESIZE
+                if consumed>done and hasattr(mapped,"madvise"):
+                    mapped.madvise(mmap.MADV_DONTNEED,done,consumed-done)
+                start=end
+
+
+class LineBreaker:
+    # Incremental version of FPDF.multi_cell's line breaking: text is fed in
+    # pieces of any size and finished lines come out as soon as they are
+    # known, as (text, width, spaces, wrapped). wrapped is True for lines
+    # that were broken at a space and get justified. Widths are in 1/1000 of
+    # the font size and come from the font's layout.Layout.
+    def __init__(self,layout,max_width):
+        self.width_of=layout.width
+        self.max_width=max_width
+        self.space=layout.space
+        self.words=[]
+        self.width=0
+        self.carry=""
+        # separator the fed text ended on, if nothing was carried after it
+        self.ended=""
+
+    def feed(self,text):
+        text=self.carry+text.replace("\r","")
+        cut=max(text.rfind(" "),text.rfind("\n"))
+        if cut<0 and (len(text)<CHUNK_SIZE or self.width_of(text)<=self.max_width):
+            # no word boundary yet, wait for more text
+            self.carry=text
+            return []
+        lines=[]
+        if cut<0:
+            # Part of one huge word: the pieces it is cut into at the line
+            # width are final, the last one may still grow with the next text.
+            self._word(text,lines)
+            self.carry=self.words.pop()
+            self.width=0
+            self.ended=""
+            return lines
+        head,self.carry=text[:cut],text[cut+1:]
+        paragraphs=head.split("\n")
+        for number,paragraph in enumerate(paragraphs):
+            if number:
+                lines.append(self._take(False))
+            # an empty paragraph has no words, unless a space comes before
+            # or after it
+            if paragraph or (not number and self.ended==" ") or (number==len(paragraphs)-1 and text[cut]==" "):
+                for word in paragraph.split(" "):
+                    self._word(word,lines)
+        self.ended="" if self.carry else text[cut]
+        if text[cut]=="\n":
+            lines.append(self._take(False))
+        return lines
+
+    def finish(self):
+        # Like multi_cell, a single trailing newline does not start a line.
+        lines=[]
+        if self.carry or self.ended==" ":
+            for word in self.carry.split(" "):
+                self._word(word,lines)
+            self.carry=""
+        elif self.ended=="\n" and not self.words:
+            return lines
+        lines.append(self._take(False))
+        return lines
+
+    def _take(self,wrapped):
+        line=" ".join(self.words)
+        spaces=len(self.words)-1 if self.words else 0
+        result=(line,self.width,spaces,wrapped)
+        self.words=[]
+        self.width=0
+        return result
+
+    def _word(self,word,lines):
+        width=self.width_of(word)
+        if self.words:
+            if self.width+self.space+width<=self.max_width:
+                self.words.append(word)
+                self.width+=self.space+width
+                return
+            lines.append(self._take(True))
+        while width>self.max_width:
+            # a word wider than the line is cut wherever it overflows
+            used=0
+            for cut,char in enumerate(word):
+                used+=self.width_of(char)
+                if used>self.max_width:
+                    break
+            cut=max(cut,1)
+            self.words=[word[:cut]]
+            self.width=self.width_of(word[:cut])
+            lines.append(self._take(False))
+            word=word[cut:]
+            width=self.width_of(word)
+        self.words=[word]
+        self.width=width
+
+
+class StreamingPDF:
+    # Minimal PDF writer for text documents that writes every page to disk as
+    # soon as it is finished, so memory use does not grow with the document.
+    # Only what is needed for page number bookkeeping and the xref table is
+    # kept until close().
+    def __init__(self,filepath,level=compression.LEVELS["default"]):
+        self.file=open(filepath,"wb")
+        self.position=0
+        # everything written so far, for the document /ID
+        self.digest=hashlib.md5()
+        # streams are compressed in the background and written when done
+        self.compressor=compression.Compressor(level) if level else None
+        self.offsets={}
+        self.pages=[]
+        self.fonts={}
+        self.font=None
+        self.page_font=None
+        self.content=None
+        self.y=0
+        self.objects=2
+        self._write(b"%PDF-1.3\n")
+
+    def _write(self,data):
+        self.file.write(data)
+        self.digest.update(data)
+        self.position+=len(data)
+
+    def _new_object(self):
+        self.objects+=1
+        return self.objects
+
+    def _object(self,number,body):
+        # While streams are being compressed, other objects queue up behind
+        # them, so the file comes out in the same order however long
+        # compression takes.
+        if self.compressor and self.compressor.pending:
+            self.compressor.put(body,number,None)
+        else:
+            self._put(body,number,None)
+
+    def _put(self,data,number,extra):
+        if extra is not None:
+            data=b"<<%s/Length %d>>\nstream\n" % (extra,len(data))+data+b"\nendstream"
+        self.offsets[number]=self.position
+        self._write(b"%d 0 obj\n" % number+data+b"\nendobj\n")
+
+    def _stream(self,number,data,extra=b""):
+        if not self.compressor:
+            self._put(data,number,extra)
+            return
+        self.compressor.submit(data,number,b"/Filter /FlateDecode "+extra)
+        self._flush()
+
+    def _flush(self,wait=False):
+        for item in self.compressor.ready(wait):
+            self._put(*item)
+
+    def add_font(self,family,filepath,style=""):
+        # Makes a TrueType font available to set_font under family/style.
+        # A file added under several styles is one font resource with one
+        # subset. fontTools is only needed once a TTF font is used.
+        import ttf
+        for font in self.fonts.values():
+            if font.get("path")==filepath:
+                self.fonts[family.lower()+style.upper()]=font
+                return
+        font=ttf.load(filepath)
+        self.fonts[family.lower()+style.upper()]={
+            "number":self._font_number(),"object":self._new_object(),"ttf":font,"used":{},"path":filepath,
+            "layout":layout.get_layout({"name":"ttf:"+filepath,"cw":font.cw})}
+
+    def _font_number(self):
+        return len({font["number"] for font in self.fonts.values()})+1
+
+    def set_font(self,family,size,style=""):
+        key=family.lower()+style.upper()
+        if key not in self.fonts:
+            key=CORE_FONTS[family.lower()]+style.upper()
+        if key not in self.fonts:
+            self.fonts[key]={"number":self._font_number(),"object":self._new_object(),
+                             "layout":layout.get_layout({"name":BASE_FONTS[key],"cw":fpdf_charwidths[key]})}
+        self.font=(key,size)
+
+    def add_page(self):
+        self._finish_page()
+        self.content=[]
+        self.page_font=None
+        self.y=MARGIN
+
+    def _finish_page(self):
+        if self.content is None:
+            return
+        contents=self._new_object()
+        page=self._new_object()
+        self._stream(contents,"\n".join(self.content).encode("latin-1"))
+        self._object(page,b"<</Type /Page\n/Parent 1 0 R\n/Resources 2 0 R\n/Contents %d 0 R>>" % contents)
+        self.pages.append(page)
+        self.content=None
+
+    def _select_font(self):
+        if self.page_font!=self.font:
+            key,size=self.font
+            self.content.append("BT /F%d %.2f Tf ET" % (self.fonts[key]["number"],size))
+            self.page_font=self.font
+
+    def _text(self,text,height,word_spacing=0):
+        if self.y+height>PAGE_BREAK:
+            self.add_page()
+        self._select_font()
+        if text:
+            key,size=self.font
+            position="BT %.2f %.2f Td " % (MARGIN+CELL_MARGIN,PAGE_HEIGHT-(self.y+.5*height+.3*size))
+            font=self.fonts[key]
+            if "ttf" in font:
+                # Tw only stretches the single byte space, so with 2-byte
+                # glyph ids the space is widened inside a TJ array instead
+                encode=font["ttf"].encode
+                used=font["used"]
+                if word_spacing:
+                    glue="%s> %.3f <" % (encode(" ",used),-word_spacing*1000/size)
+                    self.content.append(position+"[<%s>] TJ ET" % glue.join(encode(word,used) for word in text.split(" ")))
+                else:
+                    self.content.append(position+"<%s> Tj ET" % encode(text,used))
+            else:
+                if word_spacing:
+                    self.content.append("%.3f Tw" % word_spacing)
+                self.content.append(position+"(%s) Tj ET" % _escape(text))
+                if word_spacing:
+                    self.content.append("0 Tw")
+        self.y+=height
+
+    def cell(self,text,height):
+        # One line of text, then move to the next line (FPDF's cell(..., ln=1)).
+        self._text(text,height*MM)
+
+    def multi_cell(self,chunks,height):
+        # Lays out text from an iterable of chunks with FPDF.multi_cell's
+        # justified line breaking, flushing pages as they fill up.
+        key,size=self.font
+        breaker=LineBreaker(self.fonts[key]["layout"],(PAGE_WIDTH-2*MARGIN-2*CELL_MARGIN)*1000/size)
+        height*=MM
+        for chunk in chunks:
+            for line in breaker.feed(chunk):
+                self._line(line,breaker.max_width,height)
+        for line in breaker.finish():
+            self._line(line,breaker.max_width,height)
+
+    def _line(self,line,max_width,height):
+        text,width,spaces,wrapped=line
+        spacing=(max_width-width)/1000*self.font[1]/spaces if wrapped and spaces else 0
+        self._text(text,height,spacing)
+
+    def close(self):
+        self._finish_page()
+        # one entry per font resource, however many styles point at it
+        fonts={font["number"]:(key,font) for key,font in reversed(self.fonts.items())}
+        fonts=[fonts[number] for number in sorted(fonts)]
+        for key,font in fonts:
+            if "ttf" in font:
+                font["ttf"].embed(self,font["object"],font["used"])
+                continue
+            self._object(font["object"],b"<</Type /Font\n/BaseFont /%s\n/Subtype /Type1\n%s>>" % (
+                BASE_FONTS[key].encode(),b"" if key.startswith(("symbol","zapf")) else b"/Encoding /WinAnsiEncoding\n"))
+        font_refs=b"".join(b"/F%d %d 0 R\n" % (font["number"],font["object"]) for _,font in fonts)
+        if self.compressor:
+            self._flush(True)
+            self.compressor.close()
+        self._object(2,b"<</ProcSet [/PDF /Text]\n/Font <<\n%s>>\n>>" % font_refs)
+        kids=b" ".join(b"%d 0 R" % page for page in self.pages)
+        self._object(1,b"<</Type /Pages\n/Kids [%s]\n/Count %d\n/MediaBox [0 0 %.2f %.2f]\n>>" % (
+            kids,len(self.pages),PAGE_WIDTH,PAGE_HEIGHT))
+        info=self._new_object()
+        self._object(info,b"<</Producer (sp streaming writer)>>")
+        catalog=self._new_object()
+        self._object(catalog,b"<</Type /Catalog\n/Pages 1 0 R>>")
+        xref=self.position
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % (self.objects+1))
+        self._write(b"".join(b"%010d 00000 n \n" % self.offsets[number] for number in range(1,self.objects+1)))
+        self._write(b"trailer\n<<\n/Size %d\n/Root %d 0 R\n/Info %d 0 R\n%s\n>>\nstartxref\n%d\n%%%%EOF\n" % (
+            self.objects+1,catalog,info,reproducible.document_id(self.digest.hexdigest()).encode(),xref))
+        self.file.close()
+
+
+def _escape(text):
+    text=text.replace("\\","\\\\").replace("(","\\(").replace(")","\\)").replace("\r","\\r")
+    return text.encode("latin-1","replace").decode("latin-1")
@@ -0,0 +1,68 @@
+import hashlib
+import os
+import time
+
+from fpdf import FPDF
+from fpdf.fpdf import FPDF_VERSION
+
+# Byte-for-byte reproducible PDFs: no wall clock in the metadata (unless
+# SOURCE_DATE_EPOCH asks for a date) and a document /ID derived from the
+# content, plus a "<file>.sha256" sidecar later stages can compare instead
+# of reading the PDF.
+
+PRODUCER="PyFPDF "+FPDF_VERSION
+
+
+def creation_date():
+    epoch=os.environ.get("SOURCE_DATE_EPOCH")
+    if not epoch:
+        return None
+    return "D:"+time.strftime("%Y%m%d%H%M%S",time.gmtime(int(epoch)))+"Z"
+
+
+def document_id(digest):
+    return "/ID [<%s> <%s>]" % (digest,digest)
+
+
+class ReproducibleFPDF(FPDF):
+    reproducible=False
+
+    def _putinfo(self):
+        if not self.reproducible:
+            return super()._putinfo()
+        self._out('/Producer '+self._textstring(PRODUCER))
+        for field in ("title","subject","author","keywords","creator"):
+            if hasattr(self,field):
+                self._out('/'+field.title()+' '+self._textstring(getattr(self,field)))
+        date=creation_date()
+        if date:
+            self._out('/CreationDate '+self._textstring(date))
+
+    def _puttrailer(self):
+        super()._puttrailer()
+        if self.reproducible:
+            self._out(document_id(hashlib.md5(self.buffer.encode("latin1")).hexdigest()))
+
+
+def file_digest(filepath):
+    digest=hashlib.sha256()
+    with open(filepath,"rb") as file:
+        for block in iter(lambda: file.read(1<<20),b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_digest(filepath):
+    # Writes filepath.sha256 in sha256sum's format, unless it is already
+    # newer than the file. Returns the digest.
+    sidecar=filepath+".sha256"
+    try:
+        if os.stat(sidecar).st_mtime_ns>=os.stat(filepath).st_mtime_ns:
+            with open(sidecar) as file:
+                return file.read().split()[0]
+    except (OSError,IndexError):
+        pass
+    digest=file_digest(filepath)
+    with open(sidecar,"w") as file:
+        file.write(f"{digest}  {os.path.basename(filepath)}\n")
+    return digest
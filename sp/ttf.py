@@ -0,0 +1,139 @@
+import hashlib
+import io
+
+from fontTools import subset
+from fontTools.ttLib import TTFont
+
+# TrueType fonts for pdfstream. Text is written as 2-byte glyph ids
+# (Identity-H), and at the end of the document the font is embedded with
+# only the glyphs that were used, plus a ToUnicode map so the text can
+# still be searched and copied.
+
+TO_UNICODE="""/CIDInit /ProcSet findresource begin
+12 dict begin
+begincmap
+/CIDSystemInfo <</Registry (Adobe) /Ordering (UCS) /Supplement 0>> def
+/CMapName /Adobe-Identity-UCS def
+/CMapType 2 def
+1 begincodespacerange
+<0000> <FFFF>
+endcodespacerange
+%s
+endcmap
+CMapName currentdict /CMap defineresource pop
+end
+end"""
+
+# parsed fonts by path, so a process (or pool worker) reads each font once
+_fonts={}
+
+# marks in a document's used glyphs that all of ASCII is in there
+ASCII=-1
+
+
+class TrueTypeFont:
+    def __init__(self,filepath):
+        with open(filepath,"rb") as file:
+            self.data=file.read()
+        font=TTFont(io.BytesIO(self.data))
+        scale=1000/font["head"].unitsPerEm
+        metrics=font["hmtx"].metrics
+        self.name="".join(char for char in font["name"].getDebugName(6) or "TrueType" if char.isalnum() or char in "-_")
+        self.glyphs={}
+        self.cw={}
+        self.glyph_widths={0:round(metrics[font.getGlyphName(0)][0]*scale)}
+        for code,glyph in font.getBestCmap().items():
+            number=font.getGlyphID(glyph)
+            self.glyphs[chr(code)]=number
+            self.cw[chr(code)]=self.glyph_widths[number]=round(metrics[glyph][0]*scale)
+        # Pure ASCII text is encoded with one str.translate and counts as
+        # using every printable ASCII glyph, instead of being looked up and
+        # recorded a character at a time.
+        self.ascii_table={code:"%04x" % self.glyphs.get(chr(code),0) for code in range(128)}
+        self.ascii_used={self.glyphs[chr(code)]:chr(code) for code in range(32,127) if chr(code) in self.glyphs}
+        head=font["head"]
+        os2=font["OS/2"]
+        italic=font["post"].italicAngle
+        self.descriptor=b"/Flags %d\n/FontBBox [%d %d %d %d]\n/ItalicAngle %d\n/Ascent %d\n/Descent %d\n/CapHeight %d\n/StemV 80" % (
+            32+(64 if italic else 0),head.xMin*scale,head.yMin*scale,head.xMax*scale,head.yMax*scale,italic,
+            os2.sTypoAscender*scale,os2.sTypoDescender*scale,getattr(os2,"sCapHeight",os2.sTypoAscender)*scale)
+
+    def encode(self,text,used):
+        # hex glyph ids for text; used collects glyph id -> character
+        if text.isascii():
+            if ASCII not in used:
+                for number,char in self.ascii_used.items():
+                    used.setdefault(number,char)
+                used[ASCII]=""
+            return text.translate(self.ascii_table)
+        glyphs=self.glyphs
+        codes=[]
+        for char in text:
+            number=glyphs.get(char,0)
+            if number:
+                used.setdefault(number,char)
+            codes.append("%04x" % number)
+        return "".join(codes)
+
+    def subset(self,used):
+        # The font file with only the used glyphs. Glyph ids are kept, so
+        # the text already written stays valid.
+        font=TTFont(io.BytesIO(self.data))
+        options=subset.Options()
+        options.retain_gids=True
+        options.notdef_outline=True
+        options.hinting=False
+        options.layout_features=[]
+        options.name_IDs=[]
+        options.drop_tables+=["FFTM"]
+        subsetter=subset.Subsetter(options)
+        subsetter.populate(gids=sorted(used))
+        subsetter.subset(font)
+        data=io.BytesIO()
+        font.save(data)
+        return data.getvalue()
+
+    def embed(self,pdf,number,used):
+        # Writes the Type0 font as object number, and the objects it needs.
+        used={number:char for number,char in used.items() if number!=ASCII}
+        used.setdefault(0,"")
+        # subsets of the same font need names of their own, six capitals
+        # derived from the glyphs in them keep that reproducible
+        digest=hashlib.sha1(repr(sorted(used)).encode()).digest()
+        name=b"%s+%s" % (bytes(65+byte%26 for byte in digest[:6]),self.name.encode())
+        data=self.subset(used)
+        font_file=pdf._new_object()
+        pdf._stream(font_file,data,b"/Length1 %d " % len(data))
+        descriptor=pdf._new_object()
+        pdf._object(descriptor,b"<</Type /FontDescriptor\n/FontName /%s\n%s\n/FontFile2 %d 0 R>>" % (
+            name,self.descriptor,font_file))
+        widths=[]
+        run=[]
+        for glyph in sorted(used):
+            if run and glyph!=run[-1][0]+1:
+                widths.append(b"%d [%s]" % (run[0][0],b" ".join(b"%d" % width for _,width in run)))
+                run=[]
+            run.append((glyph,self.glyph_widths.get(glyph,0)))
+        widths.append(b"%d [%s]" % (run[0][0],b" ".join(b"%d" % width for _,width in run)))
+        cid_font=pdf._new_object()
+        pdf._object(cid_font,b"<</Type /Font\n/Subtype /CIDFontType2\n/BaseFont /%s\n"
+                             b"/CIDSystemInfo <</Registry (Adobe) /Ordering (Identity) /Supplement 0>>\n"
+                             b"/FontDescriptor %d 0 R\n/CIDToGIDMap /Identity\n/W [%s]>>" % (
+                                 name,descriptor,b" ".join(widths)))
+        mapped=[(glyph,char) for glyph,char in sorted(used.items()) if char]
+        blocks=[]
+        for start in range(0,len(mapped),100):
+            block=mapped[start:start+100]
+            blocks.append("%d beginbfchar\n%s\nendbfchar" % (len(block),"\n".join(
+                "<%04x> <%s>" % (glyph,char.encode("utf-16-be").hex()) for glyph,char in block)))
+        to_unicode=pdf._new_object()
+        pdf._stream(to_unicode,(TO_UNICODE % "\n".join(blocks)).encode())
+        pdf._object(number,b"<</Type /Font\n/Subtype /Type0\n/BaseFont /%s\n/Encoding /Identity-H\n"
+                           b"/DescendantFonts [%d 0 R]\n/ToUnicode %d 0 R>>" % (name,cid_font,to_unicode))
+
+
+def load(filepath):
+    font=_fonts.get(filepath)
+    if font is None:
+        font=_fonts[filepath]=TrueTypeFont(filepath)
+    return font